@@ -7,7 +7,11 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
 
-from .const import DOMAIN
+from .cache import HengdaPropertyCache
+from .const import DOMAIN, DATA_PORTFOLIO, DATA_VIEW_REGISTERED
+from .export import async_setup_services, async_unload_services
+from .portfolio import HengdaPropertyPortfolio
+from .view import HengdaPropertyDataView
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -17,6 +21,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Hengda Property from a config entry."""
     
     hass.data.setdefault(DOMAIN, {})
+    hass.data.setdefault(DATA_PORTFOLIO, HengdaPropertyPortfolio())
     
     # 导入并创建coordinator
     from .coordinator import HengdaPropertyCoordinator
@@ -29,10 +34,24 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     
+    # 注册账单导出服务
+    async_setup_services(hass)
+    
+    # 注册本地JSON数据接口（HTTP视图无法注销，只注册一次）
+    if not hass.data.get(DATA_VIEW_REGISTERED):
+        hass.http.register_view(HengdaPropertyDataView(hass))
+        hass.data[DATA_VIEW_REGISTERED] = True
+    
     return True
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
         hass.data[DOMAIN].pop(entry.entry_id)
-    return unload_ok
\ No newline at end of file
+        hass.data[DATA_PORTFOLIO].async_remove_entry(entry.entry_id)
+        async_unload_services(hass)
+    return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove cached data from disk when a config entry is removed."""
+    await HengdaPropertyCache(hass, entry.entry_id, 0).async_remove()
\ No newline at end of file
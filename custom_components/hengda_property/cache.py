@@ -0,0 +1,200 @@
+"""Memory-bounded cache for Hengda Property integration."""
+from __future__ import annotations
+
+from collections import OrderedDict
+import json
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+# 磁盘索引延迟写入的秒数，合并短时间内的多次淘汰
+INDEX_SAVE_DELAY = 10
+
+
+def estimate_size(value: Any) -> int:
+    """估算缓存值占用的字节数（按JSON序列化后的长度）
+    
+    需要完整序列化一次，较大的数据应由调用方直接提供大小或在线程池中估算。
+    """
+    try:
+        return len(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode())
+    except (TypeError, ValueError):
+        return len(repr(value).encode())
+
+
+class HengdaPropertyCache:
+    """按大小淘汰的LRU缓存
+
+    所有缓存数据共享一个内存预算，超出预算时淘汰最久未使用的数据。
+    可溢出的冷数据（例如账单历史）淘汰时写入磁盘，需要时再按需加载；
+    不可溢出的数据（例如条件请求的响应、HTTP接口的响应内容）直接丢弃。
+    常驻数据（最新数据快照和账单索引）不能淘汰，只记录大小并计入预算，
+    挤占可淘汰数据的空间。
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, budget_bytes: int) -> None:
+        """Initialize."""
+        self.hass = hass
+        self._entry_id = entry_id
+        self.budget_bytes = budget_bytes
+
+        # 键 -> (值, 估算大小, 是否可溢出到磁盘)
+        self._entries: OrderedDict[str, tuple[Any, int, bool]] = OrderedDict()
+        self.size = 0
+        # 常驻数据的键 -> 估算大小
+        self._pinned: dict[str, int] = {}
+
+        # 已写入磁盘的键，保存在一个小的索引文件中，便于删除配置条目时清理
+        self._index_store: Store = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.cache_index"
+        )
+        self._spilled_keys: set[str] | None = None
+        # 正在写入磁盘的数据，写入完成前仍从这里读取，避免短暂读不到
+        self._spilling: dict[str, Any] = {}
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "spills": 0,
+            "reloads": 0,
+        }
+
+    @property
+    def pinned_size(self) -> int:
+        """Return the total size of pinned data."""
+        return sum(self._pinned.values())
+
+    def _get_store(self, key: str) -> Store:
+        """获取溢出数据的磁盘存储"""
+        return Store(self.hass, STORAGE_VERSION, f"{DOMAIN}.{self._entry_id}.cache.{key}")
+
+    def get(self, key: str) -> Any | None:
+        """从内存中获取缓存数据，不访问磁盘"""
+        cached = self._entries.get(key)
+        if cached is None:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return cached[0]
+
+    async def async_get(self, key: str) -> Any | None:
+        """获取缓存数据，内存中没有时从磁盘加载"""
+        if key in self._entries:
+            return self.get(key)
+
+        self.stats["misses"] += 1
+        if key in self._spilling:
+            value = self._spilling[key]
+        else:
+            spilled_keys = await self._async_get_spilled_keys()
+            if key not in spilled_keys:
+                return None
+            value = await self._get_store(key).async_load()
+            if value is None:
+                return None
+        self.stats["reloads"] += 1
+        size = await self.hass.async_add_executor_job(estimate_size, value)
+        self.put(key, value, spill=True, size=size)
+        return value
+
+    @callback
+    def put(self, key: str, value: Any, spill: bool = False, size: int | None = None) -> None:
+        """写入缓存，超出内存预算时淘汰最久未使用的数据
+        
+        size为数据占用的字节数，未提供时按JSON序列化后的长度估算。
+        """
+        self.pop(key)
+        if size is None:
+            size = estimate_size(value)
+        self._entries[key] = (value, size, spill)
+        self.size += size
+        self._evict_over_budget()
+
+    @callback
+    def pin(self, key: str, size: int) -> None:
+        """记录常驻数据的大小，常驻数据计入预算但不会被淘汰"""
+        self._pinned[key] = size
+        self._evict_over_budget()
+
+    @callback
+    def _evict_over_budget(self) -> None:
+        """淘汰可淘汰的数据，直到总占用不超过预算"""
+        while self.size + self.pinned_size > self.budget_bytes and self._entries:
+            self._evict()
+
+    @callback
+    def pop(self, key: str) -> None:
+        """从内存中移除缓存数据"""
+        cached = self._entries.pop(key, None)
+        if cached is not None:
+            self.size -= cached[1]
+
+    @callback
+    def _evict(self) -> None:
+        """淘汰最久未使用的数据，可溢出的数据写入磁盘"""
+        key, (value, size, spill) = self._entries.popitem(last=False)
+        self.size -= size
+        self.stats["evictions"] += 1
+
+        if spill:
+            self.stats["spills"] += 1
+            self._spilling[key] = value
+            self.hass.async_create_task(self._async_spill(key, value))
+        _LOGGER.debug("缓存超出预算，淘汰 %s（%d字节）", key, size)
+
+    async def _async_spill(self, key: str, value: Any) -> None:
+        """把淘汰的冷数据写入磁盘，写入完成后才从待写入数据中移除"""
+        try:
+            await self._get_store(key).async_save(value)
+            spilled_keys = await self._async_get_spilled_keys()
+            if key not in spilled_keys:
+                spilled_keys.add(key)
+                self._index_store.async_delay_save(
+                    lambda: sorted(self._spilled_keys or ()), INDEX_SAVE_DELAY
+                )
+        finally:
+            # 写入期间同一个键可能再次被淘汰，只移除本次写入的数据
+            if self._spilling.get(key) is value:
+                del self._spilling[key]
+
+    async def async_get_keys(self, prefix: str) -> set[str]:
+        """获取以prefix开头的全部键，包括内存中、正在写入和已写入磁盘的数据"""
+        keys = set(self._entries) | set(self._spilling) | await self._async_get_spilled_keys()
+        return {key for key in keys if key.startswith(prefix)}
+
+    async def _async_get_spilled_keys(self) -> set[str]:
+        """获取已写入磁盘的键，首次使用时从索引文件加载"""
+        if self._spilled_keys is None:
+            self._spilled_keys = set(await self._index_store.async_load() or [])
+        return self._spilled_keys
+
+    async def async_remove(self) -> None:
+        """删除配置条目时清理磁盘上的缓存数据"""
+        self._entries.clear()
+        self.size = 0
+        self._pinned.clear()
+        self._spilling.clear()
+        for key in await self._async_get_spilled_keys():
+            await self._get_store(key).async_remove()
+        await self._index_store.async_remove()
+        self._spilled_keys = set()
+
+    def as_dict(self) -> dict[str, Any]:
+        """返回缓存使用情况，用于诊断信息"""
+        return {
+            "budget_bytes": self.budget_bytes,
+            "used_bytes": self.size + self.pinned_size,
+            "pinned_bytes": self.pinned_size,
+            "entries": len(self._entries),
+            "spilled_entries": len(self._spilled_keys or ()),
+            **self.stats,
+        }
@@ -1,6 +1,9 @@
 """Config flow for Hengda Property."""
 from __future__ import annotations
 
+from collections.abc import Mapping
+from typing import Any
+
 import voluptuous as vol
 from datetime import datetime
 from homeassistant import config_entries
@@ -12,6 +15,10 @@ from .const import (
     CONF_UNION_ID,
     CONF_AUTHORIZATION,
     CONF_YEAR,
+    CONF_SAVE_BANDWIDTH,
+    DEFAULT_SAVE_BANDWIDTH,
+    CONF_MEMORY_BUDGET,
+    DEFAULT_MEMORY_BUDGET,
 )
 
 class HengdaPropertyConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -40,6 +47,8 @@ class HengdaPropertyConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             vol.Required(CONF_UNION_ID): str,
             vol.Required(CONF_AUTHORIZATION): str,
             vol.Required(CONF_YEAR, default=current_year): vol.All(vol.Coerce(int), vol.Range(min=2020, max=2030)),
+            vol.Optional(CONF_SAVE_BANDWIDTH, default=DEFAULT_SAVE_BANDWIDTH): bool,
+            vol.Optional(CONF_MEMORY_BUDGET, default=DEFAULT_MEMORY_BUDGET): vol.All(vol.Coerce(int), vol.Range(min=1, max=512)),
         })
 
         return self.async_show_form(
@@ -49,6 +58,42 @@ class HengdaPropertyConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             description_placeholders={
                 "union_id": "Union ID",
                 "authorization": "Authorization Token",
-                "year": "数据年份"
+                "year": "数据年份",
+                "save_bandwidth": "省流量模式",
+                "memory_budget": "缓存内存预算（MB）"
             }
+        )
+
+    async def async_step_reauth(self, entry_data: Mapping[str, Any]) -> FlowResult:
+        """Handle reauthentication when the authorization token expires."""
+        self._reauth_entry = self.hass.config_entries.async_get_entry(
+            self.context["entry_id"]
+        )
+        return await self.async_step_reauth_confirm()
+
+    async def async_step_reauth_confirm(self, user_input=None) -> FlowResult:
+        """Ask for a new authorization token and update the existing entry."""
+        errors = {}
+
+        if user_input is not None:
+            if not user_input[CONF_AUTHORIZATION]:
+                errors["base"] = "invalid_auth"
+            else:
+                # 复用原有配置条目，只更新认证信息后重新加载
+                self.hass.config_entries.async_update_entry(
+                    self._reauth_entry,
+                    data={
+                        **self._reauth_entry.data,
+                        CONF_AUTHORIZATION: user_input[CONF_AUTHORIZATION],
+                    },
+                )
+                await self.hass.config_entries.async_reload(self._reauth_entry.entry_id)
+                return self.async_abort(reason="reauth_successful")
+
+        return self.async_show_form(
+            step_id="reauth_confirm",
+            data_schema=vol.Schema({
+                vol.Required(CONF_AUTHORIZATION): str,
+            }),
+            errors=errors,
         )
\ No newline at end of file
@@ -2,17 +2,45 @@
 
 DOMAIN = "hengda_property"
 DEFAULT_NAME = "恒大物业"
+
+# hass.data中跨配置条目共享的汇总数据
+DATA_PORTFOLIO = f"{DOMAIN}_portfolio"
+DATA_VIEW_REGISTERED = f"{DOMAIN}_view_registered"
 DEFAULT_SCAN_INTERVAL = 86400  # 24小时更新一次
 
 CONF_UNION_ID = "union_id"
 CONF_AUTHORIZATION = "authorization"
 CONF_YEAR = "year"  # 新增年份配置
+CONF_SAVE_BANDWIDTH = "save_bandwidth"  # 省流量模式：压缩传输和条件请求
+CONF_MEMORY_BUDGET = "memory_budget"  # 缓存内存预算（MB）
+
+DEFAULT_SAVE_BANDWIDTH = True
+DEFAULT_MEMORY_BUDGET = 8
+
+# 配置条目数据中记录旧版本固定创建的传感器是否已清理
+CONF_LEGACY_SENSORS_PRUNED = "legacy_sensors_pruned"
+
+# 事件
+EVENT_BILL_CHANGED = f"{DOMAIN}_bill_changed"
+
+# 服务
+SERVICE_EXPORT = "export"
 
 # API URLs
 API_PAID_BILL = "https://h5.hengdayun.com/api/payment/queryPaidBillRecord"
 API_PRE_CHARGE = "https://h5.hengdayun.com/api/payment/mapPreCharge" 
 API_BILL_FROM_ERP = "https://h5.hengdayun.com/api/payment/mapBillFromErp"
 
+# 认证失败时接口返回的错误码和错误信息关键字
+AUTH_ERROR_CODES = {401, 403, "401", "403"}
+AUTH_ERROR_KEYWORDS = ("token", "登录", "授权", "认证")
+
+# 响应超过该大小（字节）时，JSON解析和数据处理放到线程池中执行，避免阻塞事件循环
+LARGE_PAYLOAD_THRESHOLD = 64 * 1024
+
+# 预计用完日期的最大范围（天），超出时只给出天数，不计算日期
+FORECAST_MAX_DAYS = 3650
+
 # Headers
 DEFAULT_HEADERS = {
     "traceid": "340001171841441898602020000001A14E4F39246B95562768AD0CC9C79D57",
@@ -37,6 +65,15 @@ CHARGE_ITEMS = {
     "parking_fee": "车位服务费"
 }
 
+# 派生指标（由协调器根据抄表读数和金额计算）
+METRIC_TYPES = {
+    "consumption": "用量",
+    "unit_price": "单价",
+    "amount_change": "环比变化",
+    "water_consumption": "用水量",
+    "electricity_consumption": "用电量"
+}
+
 # 公摊费用项目（用于月公摊费计算）
 PUBLIC_CHARGE_ITEMS = [
     "water_fee",        # 公摊水费
@@ -1,28 +1,39 @@
 """Coordinator for Hengda Property integration."""
 from __future__ import annotations
 
+import asyncio
 import logging
 from datetime import datetime, timedelta
-import aiohttp
 import json
+import uuid
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryAuthFailed
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.util import dt as dt_util
 
 from .const import (
     DOMAIN,
+    DATA_PORTFOLIO,
     CONF_UNION_ID,
     CONF_AUTHORIZATION,
     CONF_YEAR,
+    CONF_SAVE_BANDWIDTH,
+    DEFAULT_SAVE_BANDWIDTH,
+    CONF_MEMORY_BUDGET,
+    DEFAULT_MEMORY_BUDGET,
     API_PAID_BILL,
     API_PRE_CHARGE,
     API_BILL_FROM_ERP,
     DEFAULT_HEADERS,
     CHARGE_ITEMS,
-    PUBLIC_CHARGE_ITEMS
+    PUBLIC_CHARGE_ITEMS,
+    EVENT_BILL_CHANGED,
+    FORECAST_MAX_DAYS,
 )
+from .cache import HengdaPropertyCache, estimate_size
+from .transport import HengdaPropertyAuthError, HengdaPropertyTransport
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -46,9 +57,45 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
         self.authorization = entry.data[CONF_AUTHORIZATION]
         self.year = entry.data.get(CONF_YEAR, datetime.now().year)
         
+        # 小区和房产（住宅、车位）标识
+        self.court_uuid = "fjpthdyjbd20191025750269b2bunscp"
+        self.house_erp_ids = ["1217951", "1569520"]
+        
+        # 预交费接口是否支持按房产列表批量查询，None表示尚未确定
+        self._prepaid_batch_supported = None
+        
+        # 跨房产和配置条目的费用汇总
+        self.portfolio = hass.data[DATA_PORTFOLIO]
+        
+        # 所有缓存数据共享的内存预算，冷的账单历史超出预算时写入磁盘；
+        # 最新数据快照和账单索引作为常驻数据计入同一预算
+        self.cache = HengdaPropertyCache(
+            hass,
+            entry.entry_id,
+            entry.data.get(CONF_MEMORY_BUDGET, DEFAULT_MEMORY_BUDGET) * 1024 * 1024,
+        )
+        
+        # API请求和流量统计
+        self.transport = HengdaPropertyTransport(
+            hass, entry.data.get(CONF_SAVE_BANDWIDTH, DEFAULT_SAVE_BANDWIDTH), self.cache
+        )
+        
         # 记录更新时间
         self.last_update_time = None
         self.last_successful_update_time = None
+        
+        # 数据快照版本，每次更新数据后递增，用于HTTP接口的ETag；
+        # 版本号在重启或重新加载后从0开始，ETag同时带上本实例的随机标识，避免与旧快照的ETag相同
+        self.data_version = 0
+        self.data_nonce = uuid.uuid4().hex
+        
+        # 原始账单记录（获取失败时为None）及其响应字节数，按(房产, 费用项目, 账单日期)建立的账单索引
+        self._bill_records = {"paid": None, "pending": None}
+        self._bill_record_sizes = {"paid": 0, "pending": 0}
+        self._bill_index = None
+        
+        # 最近一次更新中成功获取的数据类型（paid、prepaid、pending）
+        self.fresh_sources = set()
 
     def _calculate_next_update_interval(self):
         """计算到下一个03:00的时间间隔"""
@@ -70,15 +117,59 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
         try:
             # 记录当前更新时间
             current_update_time = datetime.now()
+            self._bill_records = {"paid": None, "pending": None}
+            self._bill_record_sizes = {"paid": 0, "pending": 0}
+            self.fresh_sources = set()
+            self.transport.start_refresh()
+            
+            # 并发获取三种类型的数据，预交费按(房产, 费用项目)返回
+            paid_data, prepaid_by_property, pending_data = await self._gather_fetches(
+                self._fetch_paid_bills(),
+                self._fetch_prepaid_charges(),
+                self._fetch_pending_bills(),
+            )
             
-            # 获取三种类型的数据
-            paid_data = await self._fetch_paid_bills()
-            prepaid_data = await self._fetch_prepaid_charges()
-            pending_data = await self._fetch_pending_bills()
+            fetched = {"paid": paid_data, "prepaid": prepaid_by_property, "pending": pending_data}
+            if all(value is None for value in fetched.values()):
+                raise UpdateFailed("所有类型的数据都获取失败")
+            self.fresh_sources = {source for source, value in fetched.items() if value is not None}
+            
+            # 获取失败的类型沿用上一次的数据，避免实体因临时故障变为0
+            previous_data = self.data or {}
+            if paid_data is None:
+                paid_data = previous_data.get("paid", {})
+            if prepaid_by_property is None:
+                prepaid_by_property = previous_data.get("prepaid_by_property", {})
+            if pending_data is None:
+                pending_data = previous_data.get("pending", {})
+            
+            # 各房产的预交余额按费用项目汇总，用于费用项目传感器和合计
+            prepaid_data = self._aggregate_prepaid_data(prepaid_by_property)
             
             # 计算合计数据
             total_data = self._calculate_total_data(paid_data, prepaid_data, pending_data)
             
+            # 对比账单快照，为新增、变更和已结清的账单触发事件
+            await self._async_update_bill_index()
+            
+            # 根据账单索引和已交数据计算用量、单价、环比变化等派生指标
+            metrics_data = self._calculate_metrics(paid_data)
+            
+            # 根据已交账单历史预测预交余额的可用天数
+            forecast_data = self._calculate_forecast(prepaid_by_property)
+            
+            # 只把发生变化的房产增量更新到跨配置条目的汇总中
+            self.portfolio.async_update_entry(
+                self.entry.entry_id, self._calculate_portfolio_contributions(prepaid_by_property)
+            )
+            
+            _LOGGER.debug(
+                "本次更新共%d个请求，发送%d字节，接收%d字节",
+                self.transport.refresh_stats["requests"],
+                self.transport.refresh_stats["bytes_sent"],
+                self.transport.refresh_stats["bytes_received"],
+            )
+            
             # 只有在所有API调用都成功时才更新成功时间
             self.last_successful_update_time = current_update_time
             self.last_update_time = current_update_time
@@ -86,15 +177,34 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
             # 重新计算下一次更新时间（明天的03:00）
             self.update_interval = self._calculate_next_update_interval()
             
-            return {
+            data = {
                 "paid": paid_data,
                 "prepaid": prepaid_data,
+                "prepaid_by_property": prepaid_by_property,
                 "pending": pending_data,
                 "total": total_data,
+                "metrics": metrics_data,
+                "forecast": forecast_data,
                 "last_update": self.last_successful_update_time.isoformat(),
                 "last_successful_update": self.last_successful_update_time.isoformat()
             }
             
+            # 最新数据快照和账单索引常驻内存，在线程池中估算大小后计入内存预算
+            self.cache.pin("working_set", await self.hass.async_add_executor_job(
+                estimate_size,
+                {"data": data, "bill_index": list((self._bill_index or {}).items())},
+            ))
+            
+            # 版本号在最后一个await之后递增，与协调器替换数据之间没有其他任务运行，
+            # 保证HTTP接口不会把旧数据缓存到新版本下
+            self.data_version += 1
+            return data
+            
+        except HengdaPropertyAuthError as err:
+            # 认证失效：抛出ConfigEntryAuthFailed，由Home Assistant暂停定时更新并发起重新认证
+            self.last_update_time = datetime.now()
+            raise ConfigEntryAuthFailed(f"认证信息已失效，请重新认证: {err}") from err
+            
         except Exception as err:
             # 更新失败时，保持原有数据，只更新尝试时间
             self.last_update_time = datetime.now()
@@ -108,11 +218,65 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
                 # 保留成功数据，只更新最后尝试时间
                 current_data = self.data.copy()
                 current_data["last_update"] = self.last_update_time.isoformat()
+                self.data_version += 1
                 return current_data
             else:
                 # 第一次更新就失败，返回空数据但记录错误
                 raise UpdateFailed(f"更新数据时出错: {err}")
 
+    @staticmethod
+    def _get_history_key(source, year):
+        """获取账单历史的缓存键"""
+        return f"history_{source}_{year}"
+
+    async def async_get_history_years(self, source):
+        """获取缓存中（包括已淘汰到磁盘）有账单历史的年份"""
+        prefix = self._get_history_key(source, "")
+        years = set()
+        for key in await self.cache.async_get_keys(prefix):
+            try:
+                years.add(int(key[len(prefix):]))
+            except ValueError:
+                continue
+        return years
+
+    async def async_get_bill_history(self, source, year):
+        """获取某一年的原始账单记录，已淘汰到磁盘的历史会按需加载"""
+        data = await self.cache.async_get(self._get_history_key(source, year))
+        if source == "paid":
+            return self._get_paid_records(data)
+        return self._get_pending_records(data)
+
+    def iter_ledger_rows(self, source, records):
+        """把原始账单记录逐条转换为账单明细行，用于导出"""
+        for item in records:
+            charge_type = item.get("chargeItemName", "")
+            yield {
+                "entry_id": self.entry.entry_id,
+                "property": self._get_property_key(item),
+                "house": item.get("houseName", ""),
+                "court": self._get_court_key(item),
+                "status": source,
+                "charge_item": self._get_charge_item_key(charge_type) or "",
+                "charge_item_name": charge_type,
+                "bill_date": item.get("billDate", ""),
+                "amount": float(item.get("billAmount", 0) or 0),
+                "charge_date": item.get("shouldChargeDate", ""),
+                "last_reading": item.get("lastReadDegree", ""),
+                "current_reading": item.get("currentReadDegree", ""),
+            }
+
+    async def _gather_fetches(self, *fetches):
+        """并发执行获取任务，任一任务认证失效时取消其余仍在进行的请求"""
+        tasks = [asyncio.create_task(fetch) for fetch in fetches]
+        try:
+            return await asyncio.gather(*tasks)
+        except HengdaPropertyAuthError:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
     async def _fetch_paid_bills(self):
         """获取已交物业费数据"""
         try:
@@ -127,7 +291,7 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
             end_date = f"{self.year}-12-31"
             
             payload = {
-                "courtUuid": "fjpthdyjbd20191025750269b2bunscp",
+                "courtUuid": self.court_uuid,
                 "userErpId": "1156528",
                 "startDate": start_date,
                 "endDate": end_date
@@ -135,17 +299,22 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
             
             url = f"{API_PAID_BILL}?unionId={self.union_id}"
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, headers=headers, timeout=30) as response:
-                    if response.status != 200:
-                        _LOGGER.warning("获取已交物业费API失败: %s", response.status)
-                        return self._create_default_paid_data()
-                    
-                    data = await response.json()
-                    return self._process_paid_data(data)
+            # 接口响应按年份缓存作为账单历史，可淘汰到磁盘
+            status, result = await self.transport.post(
+                "paid_bill", url, payload, headers, self._process_paid_response,
+                data_key=self._get_history_key("paid", self.year),
+            )
+            if status != 200:
+                _LOGGER.warning("获取已交物业费API失败: %s", status)
+                return None
+            
+            self._bill_records["paid"], self._bill_record_sizes["paid"], paid_data = result
+            return paid_data
+        except HengdaPropertyAuthError:
+            raise
         except Exception as err:
             _LOGGER.error("获取已交物业费数据时出错: %s", err)
-            return self._create_default_paid_data()
+            return None
 
     async def _fetch_prepaid_charges(self):
         """获取预交物业费数据"""
@@ -156,42 +325,88 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
                 "token": self.authorization
             }
             
-            # 获取住宅预交费
-            house_payload = {
-                "courtUuid": "fjpthdyjbd20191025750269b2bunscp",
-                "houseUuID": "1217951",
-                "houseErpId": "1217951"
-            }
-            
-            house_url = f"{API_PRE_CHARGE}?unionId={self.union_id}"
+            url = f"{API_PRE_CHARGE}?unionId={self.union_id}"
             
-            async with aiohttp.ClientSession() as session:
-                # 住宅预交费
-                async with session.post(house_url, json=house_payload, headers=headers, timeout=30) as response:
-                    if response.status != 200:
-                        _LOGGER.warning("获取住宅预交费API失败: %s", response.status)
-                        house_data = None
-                    else:
-                        house_data = await response.json()
-                
-                # 车位预交费
-                parking_payload = {
-                    "courtUuid": "fjpthdyjbd20191025750269b2bunscp",
-                    "houseUuID": "1569520",
-                    "houseErpId": "1569520"
+            # 优先一次请求批量获取所有房产（住宅和车位）的预交费
+            if self._prepaid_batch_supported is not False:
+                batch_payload = {
+                    "courtUuid": self.court_uuid,
+                    "houseErpIdList": self.house_erp_ids
                 }
-                
-                async with session.post(house_url, json=parking_payload, headers=headers, timeout=30) as response:
-                    if response.status != 200:
-                        _LOGGER.warning("获取车位预交费API失败: %s", response.status)
-                        parking_data = None
-                    else:
-                        parking_data = await response.json()
-            
-            return self._process_prepaid_data(house_data, parking_data)
+                status, data = await self.transport.post("pre_charge", url, batch_payload, headers)
+                if status == 200 and self._is_complete_prepaid_batch(data):
+                    self._prepaid_batch_supported = True
+                    return self._process_prepaid_data([(None, data)])
+                if self._is_prepaid_batch_unsupported(status, data):
+                    # 只有接口明确不支持批量查询时才记住结果，之后不再尝试
+                    _LOGGER.debug("预交费接口不支持批量查询，改为按房产并发查询")
+                    self._prepaid_batch_supported = False
+                elif self._prepaid_batch_supported:
+                    _LOGGER.warning("批量获取预交费API失败: %s", status)
+                    return None
+                else:
+                    # 暂时性失败（如5xx），本次按房产查询，下次更新仍尝试批量查询
+                    _LOGGER.debug("批量获取预交费API失败: %s，本次改为按房产并发查询", status)
+            
+            # 不支持批量查询时，按房产并发查询
+            responses = await asyncio.gather(*(
+                self._fetch_house_prepaid_charges(url, headers, house_erp_id)
+                for house_erp_id in self.house_erp_ids
+            ))
+            result = self._process_prepaid_data(list(zip(self.house_erp_ids, responses)))
+            
+            # 部分房产获取失败时沿用这些房产上一次的数据，避免其费用项目从合计中消失；
+            # 没有上一次数据时整体视为失败
+            previous = (self.data or {}).get("prepaid_by_property", {})
+            for house_erp_id, data in zip(self.house_erp_ids, responses):
+                if data is not None:
+                    continue
+                if house_erp_id not in previous:
+                    return None
+                result[house_erp_id] = previous[house_erp_id]
+            return result
+        except HengdaPropertyAuthError:
+            raise
         except Exception as err:
             _LOGGER.error("获取预交物业费数据时出错: %s", err)
-            return self._create_default_prepaid_data()
+            return None
+
+    async def _fetch_house_prepaid_charges(self, url, headers, house_erp_id):
+        """获取单个房产的预交费数据，失败时返回None"""
+        payload = {
+            "courtUuid": self.court_uuid,
+            "houseUuID": house_erp_id,
+            "houseErpId": house_erp_id
+        }
+        
+        status, data = await self.transport.post("pre_charge", url, payload, headers)
+        if status != 200:
+            _LOGGER.warning("获取房产%s预交费API失败: %s", house_erp_id, status)
+            return None
+        return data
+
+    def _is_complete_prepaid_batch(self, data):
+        """判断批量查询的结果是否包含了所有房产"""
+        pre_charge_list = ((data or {}).get("data") or {}).get("preChargeList")
+        if not pre_charge_list:
+            return False
+        
+        # 每条数据都必须带有房产标识，且每个房产都有数据（接口可能忽略房产列表只返回一个房产）
+        if not all(item.get("houseErpId") for item in pre_charge_list):
+            return False
+        houses = {str(item["houseErpId"]) for item in pre_charge_list}
+        return set(self.house_erp_ids) <= houses
+
+    def _is_prepaid_batch_unsupported(self, status, data):
+        """判断接口是否明确不支持批量查询
+        
+        请求参数被拒绝（4xx），或接口正常返回了数据但没有覆盖所有房产时，才认为不支持；
+        服务器错误、空数据等可能是暂时性的，不作为判断依据。
+        """
+        if status in (400, 404, 405, 422):
+            return True
+        pre_charge_list = ((data or {}).get("data") or {}).get("preChargeList")
+        return status == 200 and bool(pre_charge_list) and not self._is_complete_prepaid_batch(data)
 
     async def _fetch_pending_bills(self):
         """获取待交物业费数据"""
@@ -212,24 +427,29 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
                 "isAll": 1,
                 "startTime": start_time,
                 "endTime": end_time,
-                "courtUuid": "fjpthdyjbd20191025750269b2bunscp",
+                "courtUuid": self.court_uuid,
                 "houseUuid": "fa7db2f5f48d4f7c91463bc2e9837408",
-                "houseErpIdList": ["1217951", "1569520"]
+                "houseErpIdList": self.house_erp_ids
             }
             
             url = f"{API_BILL_FROM_ERP}?unionId={self.union_id}"
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, headers=headers, timeout=30) as response:
-                    if response.status != 200:
-                        _LOGGER.warning("获取待交物业费API失败: %s", response.status)
-                        return self._create_default_pending_data()
-                    
-                    data = await response.json()
-                    return self._process_pending_data(data)
+            # 接口响应按年份缓存作为账单历史，可淘汰到磁盘
+            status, result = await self.transport.post(
+                "bill_from_erp", url, payload, headers, self._process_pending_response,
+                data_key=self._get_history_key("pending", self.year),
+            )
+            if status != 200:
+                _LOGGER.warning("获取待交物业费API失败: %s", status)
+                return None
+            
+            self._bill_records["pending"], self._bill_record_sizes["pending"], pending_data = result
+            return pending_data
+        except HengdaPropertyAuthError:
+            raise
         except Exception as err:
             _LOGGER.error("获取待交物业费数据时出错: %s", err)
-            return self._create_default_pending_data()
+            return None
 
     def _calculate_total_data(self, paid_data, prepaid_data, pending_data):
         """计算合计数据"""
@@ -257,45 +477,345 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
             "pending_total": pending_total
         }
 
-    def _create_default_paid_data(self):
-        """创建默认的已交费用数据"""
-        return {
-            "water_fee": self._format_paid_item({}),
-            "ladder_light": self._format_paid_item({}),
-            "public_electricity": self._format_paid_item({}),
-            "elevator_electricity": self._format_paid_item({}),
-            "pump_electricity": self._format_paid_item({}),
-            "property_fee": self._format_paid_item({}),
-            "parking_fee": self._format_paid_item({})
-        }
+    def _calculate_metrics(self, paid_data):
+        """根据抄表读数和金额计算派生指标，每次更新只计算一次"""
+        items = {}
+        property_metrics = {}
+        
+        # 每个(房产, 费用项目)取最近一期带有抄表读数的账单，已交和待交账单都可以，
+        # 账单缴清后指标不会消失
+        latest_readings = {}
+        for (property_key, item_key, bill_date), bill in (self._bill_index or {}).items():
+            last_reading = bill.get("last_reading")
+            current_reading = bill.get("current_reading")
+            if last_reading is None or current_reading is None or current_reading < last_reading:
+                continue
+            latest = latest_readings.get((property_key, item_key))
+            if latest is None or bill["date_key"] > latest[1]["date_key"]:
+                latest_readings[(property_key, item_key)] = (bill_date, bill)
+        
+        # 用量按费用项目相加，单价为金额合计除以用量合计；房产用量按水、电分别相加
+        for (_, item_key), (bill_date, bill) in latest_readings.items():
+            consumption = bill["current_reading"] - bill["last_reading"]
+            item_metrics = items.setdefault(item_key, {"consumption": 0.0, "amount": 0.0})
+            item_metrics["consumption"] = round(item_metrics["consumption"] + consumption, 2)
+            item_metrics["amount"] += bill["amount"]
+            item_metrics["bill_date"] = max(item_metrics.get("bill_date", ""), bill_date)
+            
+            kind = self._get_consumption_kind(item_key, bill["name"])
+            if kind is not None:
+                metric_key = f"{kind}_consumption"
+                property_metrics[metric_key] = round(
+                    property_metrics.get(metric_key, 0.0) + consumption, 2
+                )
+        
+        for item_metrics in items.values():
+            amount = item_metrics.pop("amount")
+            if item_metrics["consumption"] > 0:
+                item_metrics["unit_price"] = round(amount / item_metrics["consumption"], 4)
+        
+        # 已交账单：计算最近一个月相对上一个月的金额变化，
+        # 房产合计只统计有上月数据的项目，保证两个月的合计口径一致
+        latest_total = 0.0
+        previous_total = 0.0
+        has_previous = False
+        for item_key, item_data in paid_data.items():
+            amount = float(item_data.get("amount", 0))
+            previous_amount = item_data.get("previous_amount")
+            if previous_amount is None:
+                continue
+            has_previous = True
+            latest_total += amount
+            previous_total += previous_amount
+            items.setdefault(item_key, {}).update(
+                self._calculate_change(amount, previous_amount)
+            )
+        
+        if has_previous:
+            property_metrics.update(self._calculate_change(latest_total, previous_total))
+        
+        return {"items": items, "property": property_metrics}
 
-    def _create_default_prepaid_data(self):
-        """创建默认的预交费用数据"""
-        return {
-            "water_fee": self._format_prepaid_item({}),
-            "ladder_light": self._format_prepaid_item({}),
-            "public_electricity": self._format_prepaid_item({}),
-            "elevator_electricity": self._format_prepaid_item({}),
-            "pump_electricity": self._format_prepaid_item({}),
-            "property_fee": self._format_prepaid_item({}),
-            "parking_fee": self._format_prepaid_item({})
-        }
+    @staticmethod
+    def _get_consumption_kind(item_key, charge_name):
+        """判断费用项目按水还是按电计量，其他费用项目返回None"""
+        if item_key == "water_fee" or "水费" in charge_name:
+            return "water"
+        if "电" in charge_name:
+            return "electricity"
+        return None
 
-    def _create_default_pending_data(self):
-        """创建默认的待交费用数据"""
-        return {
-            "water_fee": self._format_pending_item({}),
-            "ladder_light": self._format_pending_item({}),
-            "public_electricity": self._format_pending_item({}),
-            "elevator_electricity": self._format_pending_item({}),
-            "pump_electricity": self._format_pending_item({}),
-            "property_fee": self._format_pending_item({}),
-            "parking_fee": self._format_pending_item({})
-        }
+    def _calculate_forecast(self, prepaid_by_property):
+        """根据已交账单的月度历史计算消耗速度和预交余额可用天数
+        
+        一次遍历账单索引，按(房产, 费用项目)累计金额和月份范围，
+        用该房产自己的预交余额计算可用天数；费用项目和总计按余额合计除以消耗速度合计得到。
+        计算量只与账单数量成线性关系。
+        """
+        # 按(房产, 费用项目)汇总：[已交金额合计, 最早月份序号, 最晚月份序号]
+        history = {}
+        for (property_key, item_key, _), bill in (self._bill_index or {}).items():
+            if bill["status"] != "paid":
+                continue
+            first_month = self._get_month_ordinal(bill["date_key"])
+            if first_month is None:
+                continue
+            # 跨多个月的账单（如按季度、按年收取的物业费）按账单结束月份计算范围
+            last_month = self._get_month_ordinal(bill.get("end_key", bill["date_key"]))
+            if last_month is None or last_month < first_month:
+                last_month = first_month
+            summary = history.get((property_key, item_key))
+            if summary is None:
+                history[(property_key, item_key)] = [bill["amount"], first_month, last_month]
+            else:
+                summary[0] += bill["amount"]
+                summary[1] = min(summary[1], first_month)
+                summary[2] = max(summary[2], last_month)
+        
+        today = dt_util.now().date()
+        properties = {}
+        items = {}
+        # 有预交余额的(房产, 费用项目)按费用项目和总计累计：[余额合计, 日均消耗合计]
+        item_coverage = {}
+        total_coverage = [0.0, 0.0]
+        for (property_key, item_key), (amount, first_month, last_month) in history.items():
+            monthly_rate = amount / (last_month - first_month + 1)
+            daily_rate = monthly_rate * 12 / 365
+            if daily_rate <= 0:
+                continue
+            
+            forecast = {
+                "monthly_rate": round(monthly_rate, 2),
+                "daily_rate": round(daily_rate, 2),
+            }
+            item_forecast = items.setdefault(
+                item_key, {"monthly_rate": 0.0, "daily_rate": 0.0, "properties": {}}
+            )
+            item_forecast["monthly_rate"] = round(item_forecast["monthly_rate"] + monthly_rate, 2)
+            item_forecast["daily_rate"] = round(item_forecast["daily_rate"] + daily_rate, 2)
+            
+            prepaid = prepaid_by_property.get(property_key, {}).get(item_key)
+            if prepaid is not None:
+                balance = max(prepaid["balance"], 0)
+                days = balance / daily_rate
+                forecast["days_until_depletion"] = int(days)
+                forecast["depletion_date"] = self._get_depletion_date(today, days)
+                item_forecast["properties"][property_key] = int(days)
+                for coverage in (item_coverage.setdefault(item_key, [0.0, 0.0]), total_coverage):
+                    coverage[0] += balance
+                    coverage[1] += daily_rate
+            properties.setdefault(property_key, {})[item_key] = forecast
+        
+        for item_key, (balance, daily_rate) in item_coverage.items():
+            days = balance / daily_rate
+            items[item_key]["days_until_depletion"] = int(days)
+            items[item_key]["depletion_date"] = self._get_depletion_date(today, days)
+        
+        total = {}
+        balance, daily_rate = total_coverage
+        if daily_rate > 0:
+            days = balance / daily_rate
+            total = {
+                "daily_rate": round(daily_rate, 2),
+                "days_until_depletion": int(days),
+                "depletion_date": self._get_depletion_date(today, days),
+            }
+        
+        return {"items": items, "properties": properties, "total": total}
+
+    @staticmethod
+    def _get_depletion_date(today, days):
+        """计算预计用完日期，超出预测范围时返回空字符串，避免日期溢出"""
+        if days > FORECAST_MAX_DAYS:
+            return ""
+        return (today + timedelta(days=int(days))).isoformat()
+
+    @staticmethod
+    def _get_month_ordinal(date_key):
+        """将账单日期键转换为月份序号（年*12+月），无法解析时返回None"""
+        date_str = str(date_key)
+        if date_key <= 0 or len(date_str) < 6:
+            return None
+        year, month = int(date_str[:4]), int(date_str[4:6])
+        if not 1 <= month <= 12:
+            return None
+        return year * 12 + month - 1
+
+    @staticmethod
+    def _calculate_change(amount, previous_amount):
+        """计算金额的环比变化"""
+        change = {"amount_change": round(amount - previous_amount, 2)}
+        if previous_amount:
+            change["amount_change_pct"] = round(
+                (amount - previous_amount) / previous_amount * 100, 1
+            )
+        return change
+
+    @staticmethod
+    def _parse_reading(reading):
+        """解析抄表读数，无法解析时返回None"""
+        try:
+            return float(reading)
+        except (TypeError, ValueError):
+            return None
+
+    async def _async_update_bill_index(self):
+        """更新账单索引并为变化的账单触发事件
+        
+        账单记录较多时在线程池中建立索引，否则在事件循环中建立并计入阻塞时间统计。
+        """
+        new_index = await self.transport.async_run(
+            sum(self._bill_record_sizes.values()), self._build_bill_index
+        )
+        
+        # 首次更新只建立基线，不触发事件
+        if self._bill_index is not None:
+            for change, key, bill, previous in self._diff_bill_index(self._bill_index, new_index):
+                property_key, item_key, bill_date = key
+                event_data = {
+                    "entry_id": self.entry.entry_id,
+                    "change": change,
+                    "property": property_key,
+                    "charge_item": item_key,
+                    "charge_item_name": bill["name"],
+                    "bill_date": bill_date,
+                    "amount": bill["amount"],
+                    "status": bill["status"],
+                }
+                if previous is not None:
+                    event_data["previous_amount"] = previous["amount"]
+                self.hass.bus.async_fire(EVENT_BILL_CHANGED, event_data)
+        
+        self._bill_index = new_index
+
+    def _build_bill_index(self):
+        """按(房产, 费用项目, 账单日期)建立账单索引，已交账单覆盖同键的待交账单
+        
+        可能在线程池中执行，只能读取协调器状态，不能修改。
+        """
+        indexes = {}
+        for source in ("pending", "paid"):
+            records = self._bill_records.get(source)
+            if records is None:
+                # 本次获取失败，沿用上一次的索引，避免把所有账单误判为新增
+                indexes[source] = {
+                    key: bill for key, bill in (self._bill_index or {}).items()
+                    if bill["status"] == source
+                }
+                continue
+            
+            index = {}
+            for item in records:
+                charge_type = item.get("chargeItemName", "")
+                item_key = self._get_charge_item_key(charge_type)
+                if not item_key:
+                    continue
+                key = (self._get_property_key(item), item_key, item.get("billDate", ""))
+                if key in index:
+                    # 同一账单期有多条记录时金额求和
+                    index[key]["amount"] = round(
+                        index[key]["amount"] + float(item.get("billAmount", 0)), 2
+                    )
+                else:
+                    index[key] = {
+                        "name": charge_type,
+                        "amount": round(float(item.get("billAmount", 0)), 2),
+                        "status": source,
+                        "date_key": self._get_bill_date_key(item),
+                        "end_key": self._get_bill_end_key(item),
+                        "court": self._get_court_key(item),
+                        "last_reading": self._parse_reading(item.get("lastReadDegree")),
+                        "current_reading": self._parse_reading(item.get("currentReadDegree")),
+                    }
+            indexes[source] = index
+        
+        return {**indexes["pending"], **indexes["paid"]}
+
+    @staticmethod
+    def _diff_bill_index(old_index, new_index):
+        """对比两次账单索引，返回(变化类型, 键, 当前账单, 之前账单)列表"""
+        changes = []
+        for key, bill in new_index.items():
+            previous = old_index.get(key)
+            if previous is None:
+                changes.append(("new", key, bill, None))
+            elif previous["status"] != "paid" and bill["status"] == "paid":
+                changes.append(("settled", key, bill, previous))
+            elif previous["amount"] != bill["amount"]:
+                changes.append(("changed", key, bill, previous))
+        return changes
+
+    def _calculate_portfolio_contributions(self, prepaid_by_property):
+        """按房产计算对汇总的贡献：预交余额、最近一个月已交金额和待交金额"""
+        contributions = {}
+        latest_paid = {}
+        
+        def get_amounts(property_key, court, item_key):
+            contribution = contributions.setdefault(property_key, {"court": court, "items": {}})
+            return contribution["items"].setdefault(
+                item_key, {"prepaid": 0.0, "paid": 0.0, "pending": 0.0}
+            )
+        
+        for (property_key, item_key, _), bill in (self._bill_index or {}).items():
+            amounts = get_amounts(property_key, bill["court"], item_key)
+            if bill["status"] == "pending":
+                amounts["pending"] = round(amounts["pending"] + bill["amount"], 2)
+            else:
+                latest = latest_paid.get((property_key, item_key))
+                if latest is None or bill["date_key"] > latest[0]:
+                    latest_paid[(property_key, item_key)] = (bill["date_key"], bill["amount"])
+        
+        for (property_key, item_key), (_, amount) in latest_paid.items():
+            contributions[property_key]["items"][item_key]["paid"] = amount
+        
+        for property_key, property_items in prepaid_by_property.items():
+            for item_key, item_data in property_items.items():
+                amounts = get_amounts(property_key, item_data.get("court", ""), item_key)
+                amounts["prepaid"] = round(amounts["prepaid"] + item_data["balance"], 2)
+        
+        return contributions
+
+    def _get_property_key(self, item):
+        """获取账单所属房产的标识"""
+        for field in ("houseErpId", "houseUuid", "houseName"):
+            if item.get(field):
+                return str(item[field])
+        return ""
+
+    def _get_court_key(self, item):
+        """获取账单所属小区的标识"""
+        for field in ("courtName", "courtUuid"):
+            if item.get(field):
+                return str(item[field])
+        return ""
+
+    def _process_paid_response(self, data, size):
+        """处理已交费用接口响应，返回(原始账单记录, 响应字节数, 处理后的数据)
+        
+        响应较大时在线程池中执行，只能读取协调器状态，不能修改。
+        """
+        return self._get_paid_records(data), size, self._process_paid_data(data)
+
+    def _process_pending_response(self, data, size):
+        """处理待交费用接口响应，返回(原始账单记录, 响应字节数, 处理后的数据)
+        
+        响应较大时在线程池中执行，只能读取协调器状态，不能修改。
+        """
+        return self._get_pending_records(data), size, self._process_pending_data(data)
+
+    @staticmethod
+    def _get_paid_records(data):
+        """从已交费用接口响应中取出原始账单记录"""
+        return (data or {}).get("data") or []
+
+    @staticmethod
+    def _get_pending_records(data):
+        """从待交费用接口响应中取出原始账单记录"""
+        return (data or {}).get("data", {}).get("erpBillList") or []
 
     def _process_paid_data(self, data):
         """处理已交费用数据 - 按照原始流程逻辑处理最近一个月的数据"""
-        result = self._create_default_paid_data()
+        result = {}
         
         if data and data.get("data"):
             # 按费用类型分组
@@ -314,16 +834,29 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
                 latest_month_data = self._get_latest_month_summed_data(items)
                 if latest_month_data:
                     result[item_key] = self._format_paid_item(latest_month_data)
+                    
+                    # 记录上一个月的金额，用于计算环比变化
+                    latest_date_key = self._get_bill_date_key(latest_month_data)
+                    previous_month_data = None
+                    if latest_date_key:
+                        previous_month_data = self._get_latest_month_summed_data([
+                            item for item in items
+                            if self._get_bill_date_key(item) != latest_date_key
+                        ])
+                    result[item_key]["previous_amount"] = (
+                        float(previous_month_data.get("billAmount", 0))
+                        if previous_month_data else None
+                    )
         
         return result
 
     def _get_charge_item_key(self, charge_type):
-        """根据费用类型名称获取对应的键"""
+        """根据费用类型名称获取对应的键，未知的费用项目直接使用其名称"""
         if "公摊水费" in charge_type:
             return "water_fee"
         elif "梯灯公摊电费" in charge_type:
             return "ladder_light"
-        elif "公共区域公摊电费" in charge_type:
+        elif "区域公摊电费" in charge_type:
             return "public_electricity"
         elif "电梯公摊电费" in charge_type:
             return "elevator_electricity"
@@ -333,7 +866,7 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
             return "property_fee"
         elif "车位服务费" in charge_type:
             return "parking_fee"
-        return None
+        return charge_type.strip() or None
 
     def _get_latest_month_summed_data(self, items):
         """获取最近一个月的数据并求和 - 按照原始流程逻辑"""
@@ -341,16 +874,7 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
             return None
             
         # 首先按日期排序，找到最近的日期
-        # 使用日期字符串进行排序，处理各种日期格式
-        def get_date_key(item):
-            bill_date = item.get("billDate", "")
-            # 处理不同的日期格式
-            if "-" in bill_date:  # 格式如 "20251001-20251031"
-                # 取开始日期部分
-                date_part = bill_date.split("-")[0]
-                return int(date_part) if date_part.isdigit() else 0
-            else:  # 格式如 "202509" 或其他
-                return int(bill_date) if bill_date.isdigit() else 0
+        get_date_key = self._get_bill_date_key
         
         sorted_items = sorted(items, key=get_date_key, reverse=True)
         
@@ -389,6 +913,28 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
         
         return merged_item
 
+    @staticmethod
+    def _get_bill_date_key(item):
+        """将账单日期转换为可排序的整数，处理各种日期格式"""
+        bill_date = item.get("billDate", "")
+        # 处理不同的日期格式
+        if "-" in bill_date:  # 格式如 "20251001-20251031"
+            # 取开始日期部分
+            date_part = bill_date.split("-")[0]
+            return int(date_part) if date_part.isdigit() else 0
+        else:  # 格式如 "202509" 或其他
+            return int(bill_date) if bill_date.isdigit() else 0
+
+    @staticmethod
+    def _get_bill_end_key(item):
+        """获取账单日期范围的结束日期（如 "20250101-20251231" 的 20251231），没有范围时与开始日期相同"""
+        bill_date = item.get("billDate", "")
+        if "-" in bill_date:
+            end_part = bill_date.split("-")[-1]
+            if end_part.isdigit():
+                return int(end_part)
+        return HengdaPropertyCoordinator._get_bill_date_key(item)
+
     def _format_paid_item(self, item):
         """格式化已交费用项"""
         return {
@@ -400,36 +946,65 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
             "status": item.get("chargeStatus", "未知")
         }
 
-    def _process_prepaid_data(self, house_data, parking_data):
-        """处理预交费用数据"""
-        result = self._create_default_prepaid_data()
+    def _process_prepaid_data(self, responses):
+        """处理预交费用数据，返回{房产: {费用项目: 预交费用}}
+        
+        responses为(查询的房产, 响应)列表，批量查询时房产为None，按每条数据的房产标识归属。
+        费用项目按名称匹配（车位服务费不再依赖在列表中的位置）。
+        """
+        result = {}
+        
+        for house_erp_id, data in responses:
+            if not data or not (data.get("data") or {}).get("preChargeList"):
+                continue
+            for item in data["data"]["preChargeList"]:
+                item_key = self._get_charge_item_key(item.get("chargeItemName", ""))
+                if not item_key:
+                    continue
+                
+                property_key = house_erp_id or self._get_property_key(item)
+                formatted = self._format_prepaid_item(item, property_key)
+                property_items = result.setdefault(property_key, {})
+                existing = property_items.get(item_key)
+                if existing is None:
+                    property_items[item_key] = formatted
+                else:
+                    # 同一房产的同一费用项目有多条（如不同子费用项）时金额相加
+                    existing["balance"] = round(existing["balance"] + formatted["balance"], 2)
+                    existing["frozen_amount"] = round(
+                        existing["frozen_amount"] + formatted["frozen_amount"], 2
+                    )
         
-        # 处理住宅预交费
-        if house_data and house_data.get("data", {}).get("preChargeList"):
-            for item in house_data["data"]["preChargeList"]:
-                charge_type = item.get("chargeItemName", "")
-                if "梯灯公摊电费" in charge_type:
-                    result["ladder_light"] = self._format_prepaid_item(item)
-                elif "电梯公摊电费" in charge_type:
-                    result["elevator_electricity"] = self._format_prepaid_item(item)
-                elif "公共区域公摊电费" in charge_type:
-                    result["public_electricity"] = self._format_prepaid_item(item)
-                elif "公摊水费" in charge_type:
-                    result["water_fee"] = self._format_prepaid_item(item)
-                elif "水泵公摊电费" in charge_type:
-                    result["pump_electricity"] = self._format_prepaid_item(item)
-                elif "住宅物业服务费" in charge_type:
-                    result["property_fee"] = self._format_prepaid_item(item)
-        
-        # 处理车位预交费
-        if (parking_data and parking_data.get("data", {}).get("preChargeList") and 
-            len(parking_data["data"]["preChargeList"]) >= 3):
-            parking_item = parking_data["data"]["preChargeList"][2]  # 第三个是车位费
-            result["parking_fee"] = self._format_prepaid_item(parking_item)
-            
         return result
 
-    def _format_prepaid_item(self, item):
+    @staticmethod
+    def _aggregate_prepaid_data(prepaid_by_property):
+        """把各房产的预交费用按费用项目汇总，余额和冻结金额相加"""
+        result = {}
+        for property_key, property_items in prepaid_by_property.items():
+            for item_key, item_data in property_items.items():
+                aggregated = result.get(item_key)
+                if aggregated is None:
+                    aggregated = result[item_key] = {
+                        "balance": 0.0,
+                        "customer": item_data["customer"],
+                        "house": item_data["house"],
+                        "charge_item": item_data["charge_item"],
+                        "sub_charge_item": item_data["sub_charge_item"],
+                        "frozen_amount": 0.0,
+                        # 房产 -> 该房产的余额
+                        "properties": {},
+                    }
+                elif item_data["house"] not in aggregated["house"].split("、"):
+                    aggregated["house"] = f"{aggregated['house']}、{item_data['house']}"
+                aggregated["balance"] = round(aggregated["balance"] + item_data["balance"], 2)
+                aggregated["frozen_amount"] = round(
+                    aggregated["frozen_amount"] + item_data["frozen_amount"], 2
+                )
+                aggregated["properties"][property_key] = item_data["balance"]
+        return result
+
+    def _format_prepaid_item(self, item, property_key):
         """格式化预交费用项"""
         return {
             "balance": float(item.get("balance", 0)),
@@ -437,28 +1012,20 @@ class HengdaPropertyCoordinator(DataUpdateCoordinator):
             "house": item.get("houseName", "未知"),
             "charge_item": item.get("chargeItemName", "未知项目"),
             "sub_charge_item": item.get("subChargeItemName", ""),
-            "frozen_amount": float(item.get("frozenHanSum", 0))
+            "frozen_amount": float(item.get("frozenHanSum", 0)),
+            "property": property_key,
+            "court": self._get_court_key(item)
         }
 
     def _process_pending_data(self, data):
         """处理待交费用数据"""
-        result = self._create_default_pending_data()
+        result = {}
         
         if data and data.get("data", {}).get("erpBillList"):
             for item in data["data"]["erpBillList"]:
-                charge_type = item.get("chargeItemName", "")
-                if "住宅物业服务费" in charge_type:
-                    result["property_fee"] = self._format_pending_item(item)
-                elif "水泵公摊电费" in charge_type:
-                    result["pump_electricity"] = self._format_pending_item(item)
-                elif "区域公摊电费" in charge_type:
-                    result["public_electricity"] = self._format_pending_item(item)
-                elif "公摊水费" in charge_type:
-                    result["water_fee"] = self._format_pending_item(item)
-                elif "电梯公摊电费" in charge_type:
-                    result["elevator_electricity"] = self._format_pending_item(item)
-                elif "梯灯公摊电费" in charge_type:
-                    result["ladder_light"] = self._format_pending_item(item)
+                item_key = self._get_charge_item_key(item.get("chargeItemName", ""))
+                if item_key:
+                    result[item_key] = self._format_pending_item(item)
         return result
 
     def _format_pending_item(self, item):
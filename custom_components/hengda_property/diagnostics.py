@@ -0,0 +1,26 @@
+"""Diagnostics support for Hengda Property."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, CONF_UNION_ID, CONF_AUTHORIZATION
+from .coordinator import HengdaPropertyCoordinator
+
+TO_REDACT = {CONF_UNION_ID, CONF_AUTHORIZATION}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: HengdaPropertyCoordinator = hass.data[DOMAIN][entry.entry_id]
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "transport": coordinator.transport.as_dict(),
+        "cache": coordinator.cache.as_dict(),
+    }
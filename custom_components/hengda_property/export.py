@@ -0,0 +1,221 @@
+"""Bill ledger export service for Hengda Property."""
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+import csv
+from datetime import date
+import json
+import logging
+import os
+import re
+from typing import Any, TextIO
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN, SERVICE_EXPORT
+from .coordinator import HengdaPropertyCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# 每次写入文件的行数，导出过程中内存中最多只保留这么多行
+EXPORT_CHUNK_SIZE = 500
+
+# 导出文件只写入配置目录下的专用子目录
+EXPORT_DIR = f"{DOMAIN}_exports"
+# 允许的文件名：字母、数字、下划线、连字符和点，且以导出格式作为扩展名
+EXPORT_FILENAME_PATTERN = re.compile(r"^[A-Za-z0-9_\-][A-Za-z0-9_.\-]*\.(csv|jsonl)$")
+
+ATTR_ENTRY_ID = "entry_id"
+ATTR_PROPERTY = "property"
+ATTR_CHARGE_ITEM = "charge_item"
+ATTR_START_DATE = "start_date"
+ATTR_END_DATE = "end_date"
+ATTR_FORMAT = "format"
+ATTR_FILENAME = "filename"
+
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+
+LEDGER_FIELDS = (
+    "entry_id",
+    "property",
+    "court",
+    "status",
+    "charge_item",
+    "charge_item_name",
+    "bill_date",
+    "amount",
+    "charge_date",
+    "last_reading",
+    "current_reading",
+)
+
+EXPORT_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_ENTRY_ID): cv.string,
+    vol.Optional(ATTR_PROPERTY): cv.string,
+    vol.Optional(ATTR_CHARGE_ITEM): cv.string,
+    vol.Optional(ATTR_START_DATE): cv.date,
+    vol.Optional(ATTR_END_DATE): cv.date,
+    vol.Optional(ATTR_FORMAT, default=FORMAT_CSV): vol.In([FORMAT_CSV, FORMAT_JSONL]),
+    vol.Optional(ATTR_FILENAME): cv.string,
+})
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the export service."""
+    if hass.services.has_service(DOMAIN, SERVICE_EXPORT):
+        return
+
+    async def async_handle_export(call: ServiceCall) -> ServiceResponse:
+        """Handle the export service call."""
+        return await async_export_ledger(hass, call.data)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT,
+        async_handle_export,
+        schema=EXPORT_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+def async_unload_services(hass: HomeAssistant) -> None:
+    """Remove the export service when the last entry is unloaded."""
+    if not hass.data.get(DOMAIN):
+        hass.services.async_remove(DOMAIN, SERVICE_EXPORT)
+
+
+def _parse_bill_date(bill_date: str) -> date | None:
+    """解析账单日期（如 "20251001-20251031" 或 "202509"）的开始日期"""
+    date_part = bill_date.split("-")[0]
+    try:
+        if len(date_part) >= 8:
+            return date(int(date_part[:4]), int(date_part[4:6]), int(date_part[6:8]))
+        if len(date_part) >= 6:
+            return date(int(date_part[:4]), int(date_part[4:6]), 1)
+    except ValueError:
+        pass
+    return None
+
+
+async def async_export_ledger(hass: HomeAssistant, options: dict[str, Any]) -> dict[str, Any]:
+    """把账单明细分块流式写入配置目录下导出子目录中的新文件"""
+    coordinators: dict[str, HengdaPropertyCoordinator] = hass.data.get(DOMAIN, {})
+    if ATTR_ENTRY_ID in options:
+        if options[ATTR_ENTRY_ID] not in coordinators:
+            raise HomeAssistantError(f"未找到配置条目: {options[ATTR_ENTRY_ID]}")
+        coordinators = {options[ATTR_ENTRY_ID]: coordinators[options[ATTR_ENTRY_ID]]}
+
+    export_format = options[ATTR_FORMAT]
+    filename = (
+        options.get(ATTR_FILENAME)
+        or f"{DOMAIN}_ledger_{dt_util.now().strftime('%Y%m%d%H%M%S')}.{export_format}"
+    )
+    match = EXPORT_FILENAME_PATTERN.match(filename)
+    if match is None or match.group(1) != export_format:
+        raise HomeAssistantError(
+            f"文件名无效: {filename}，只能包含字母、数字、下划线、连字符和点，"
+            f"且扩展名必须为 .{export_format}"
+        )
+    path = os.path.join(hass.config.path(EXPORT_DIR), filename)
+
+    try:
+        file = await hass.async_add_executor_job(_open_export_file, path)
+    except FileExistsError as err:
+        raise HomeAssistantError(f"导出文件已存在: {path}") from err
+    rows = 0
+    try:
+        if export_format == FORMAT_CSV:
+            await hass.async_add_executor_job(_write_csv_chunk, file, None)
+
+        chunk: list[dict[str, Any]] = []
+        for coordinator in coordinators.values():
+            async for row in _async_iter_ledger(coordinator, options):
+                chunk.append(row)
+                if len(chunk) >= EXPORT_CHUNK_SIZE:
+                    await _async_write_chunk(hass, file, export_format, chunk)
+                    rows += len(chunk)
+                    chunk = []
+        if chunk:
+            await _async_write_chunk(hass, file, export_format, chunk)
+            rows += len(chunk)
+    finally:
+        await hass.async_add_executor_job(file.close)
+
+    _LOGGER.info("已导出%d条账单记录到 %s", rows, path)
+    return {"path": path, "rows": rows}
+
+
+async def _async_iter_ledger(
+    coordinator: HengdaPropertyCoordinator, options: dict[str, Any]
+) -> AsyncIterator[dict[str, Any]]:
+    """逐条生成符合筛选条件的账单明细"""
+    start_date: date | None = options.get(ATTR_START_DATE)
+    end_date: date | None = options.get(ATTR_END_DATE)
+    property_filter = options.get(ATTR_PROPERTY)
+    item_filter = options.get(ATTR_CHARGE_ITEM)
+
+    for source in ("paid", "pending"):
+        # 未指定日期范围时只导出配置的年份；指定了起止日期之一时，
+        # 读取缓存中（包括已淘汰到磁盘）该范围内的所有年份
+        if start_date is None and end_date is None:
+            years = [coordinator.year]
+        else:
+            years = sorted(
+                year
+                for year in await coordinator.async_get_history_years(source)
+                if (start_date is None or year >= start_date.year)
+                and (end_date is None or year <= end_date.year)
+            )
+        for year in years:
+            records = await coordinator.async_get_bill_history(source, year)
+            for row in coordinator.iter_ledger_rows(source, records):
+                if property_filter and property_filter not in (row["property"], row["house"]):
+                    continue
+                if item_filter and item_filter not in (row["charge_item"], row["charge_item_name"]):
+                    continue
+                if start_date or end_date:
+                    bill_date = _parse_bill_date(row["bill_date"])
+                    if bill_date is None:
+                        continue
+                    if start_date and bill_date < start_date:
+                        continue
+                    if end_date and bill_date > end_date:
+                        continue
+                del row["house"]
+                yield row
+
+
+async def _async_write_chunk(
+    hass: HomeAssistant, file: TextIO, export_format: str, chunk: list[dict[str, Any]]
+) -> None:
+    """在线程池中写入一块数据，避免阻塞事件循环"""
+    if export_format == FORMAT_CSV:
+        await hass.async_add_executor_job(_write_csv_chunk, file, chunk)
+    else:
+        await hass.async_add_executor_job(_write_jsonl_chunk, file, chunk)
+
+
+def _open_export_file(path: str) -> TextIO:
+    """创建导出文件，文件已存在时抛出FileExistsError，不覆盖已有文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return open(path, "x", encoding="utf-8", newline="")
+
+
+def _write_csv_chunk(file: TextIO, chunk: list[dict[str, Any]] | None) -> None:
+    """写入CSV数据块，chunk为None时写入表头"""
+    writer = csv.DictWriter(file, fieldnames=LEDGER_FIELDS)
+    if chunk is None:
+        writer.writeheader()
+    else:
+        writer.writerows(chunk)
+
+
+def _write_jsonl_chunk(file: TextIO, chunk: list[dict[str, Any]]) -> None:
+    """写入JSON Lines数据块"""
+    file.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in chunk)
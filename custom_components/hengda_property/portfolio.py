@@ -0,0 +1,162 @@
+"""Portfolio totals across properties and config entries for Hengda Property."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import Any
+
+from homeassistant.core import callback
+
+# 汇总的金额字段：预交余额、最近一个月已交金额、待交金额
+PORTFOLIO_FIELDS = ("prepaid", "paid", "pending")
+
+
+def _create_empty_totals() -> dict[str, float]:
+    """创建空的合计"""
+    return {field: 0.0 for field in PORTFOLIO_FIELDS}
+
+
+class HengdaPropertyPortfolio:
+    """跨房产和配置条目维护的费用合计
+
+    每个房产的贡献单独保存，更新时只对贡献发生变化的房产做增量加减，
+    不需要重新扫描所有配置条目的数据。多个配置条目（例如同一账号配置了两次，
+    或家人账号绑定了同一套房产）提供同一房产时，合计中只计入其中一个条目的贡献。
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        # (配置条目ID, 房产) -> {"court": 小区, "items": {费用项目: {字段: 金额}}}
+        self._contributions: dict[tuple[str, str], dict[str, Any]] = {}
+        self._entry_properties: dict[str, set[str]] = {}
+        # 房产 -> 其贡献已计入合计的配置条目ID
+        self._counted_entries: dict[str, str] = {}
+        self._court_property_counts: dict[str, int] = {}
+
+        # 运行中的合计
+        self.overall = _create_empty_totals()
+        self.by_court: dict[str, dict[str, float]] = {}
+        self.by_item: dict[str, dict[str, float]] = {}
+
+        self.version = 0
+        # 负责创建汇总传感器的配置条目，以及各已加载配置条目创建汇总传感器的方法
+        self.owner_entry_id: str | None = None
+        self._sensor_adders: dict[str, Callable[[], None]] = {}
+        self._listeners: list[Callable[[], None]] = []
+
+    @property
+    def property_count(self) -> int:
+        """Return the number of properties in the portfolio."""
+        return len(self._counted_entries)
+
+    @callback
+    def async_add_listener(self, update_callback: Callable[[], None]) -> Callable[[], None]:
+        """监听合计变化，返回取消监听的函数"""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_register_entry(self, entry_id: str, add_sensors: Callable[[], None]) -> None:
+        """登记配置条目创建汇总传感器的方法，尚无负责的配置条目时由它创建"""
+        self._sensor_adders[entry_id] = add_sensors
+        if self.owner_entry_id is None:
+            self._async_assign_owner(entry_id)
+
+    @callback
+    def _async_assign_owner(self, entry_id: str) -> None:
+        """指定负责汇总传感器的配置条目并创建传感器"""
+        self.owner_entry_id = entry_id
+        self._sensor_adders[entry_id]()
+
+    @callback
+    def async_update_entry(self, entry_id: str, contributions: dict[str, dict[str, Any]]) -> None:
+        """用配置条目的最新房产贡献更新合计，只处理发生变化的房产"""
+        changed = False
+        contributions = {
+            self._get_property_id(entry_id, property_key): contribution
+            for property_key, contribution in contributions.items()
+        }
+        old_properties = self._entry_properties.get(entry_id, set())
+
+        for property_id, contribution in contributions.items():
+            key = (entry_id, property_id)
+            old_contribution = self._contributions.get(key)
+            if old_contribution == contribution:
+                continue
+            self._contributions[key] = contribution
+            counted_entry_id = self._counted_entries.setdefault(property_id, entry_id)
+            if counted_entry_id != entry_id:
+                # 该房产已由其他配置条目计入合计，只保存贡献以便那个条目移除后接替
+                continue
+            if old_contribution is not None:
+                self._apply(old_contribution, -1)
+            self._apply(contribution, 1)
+            changed = True
+
+        self._entry_properties[entry_id] = set(contributions)
+        for property_id in old_properties - contributions.keys():
+            old_contribution = self._contributions.pop((entry_id, property_id))
+            if self._counted_entries[property_id] != entry_id:
+                continue
+            self._apply(old_contribution, -1)
+            del self._counted_entries[property_id]
+            changed = True
+            # 改由仍提供该房产的其他配置条目计入合计
+            for other_entry_id, properties in self._entry_properties.items():
+                if property_id in properties:
+                    self._counted_entries[property_id] = other_entry_id
+                    self._apply(self._contributions[(other_entry_id, property_id)], 1)
+                    break
+
+        if changed:
+            self._async_notify()
+
+    @callback
+    def async_remove_entry(self, entry_id: str) -> None:
+        """移除配置条目的全部贡献"""
+        self.async_update_entry(entry_id, {})
+        self._entry_properties.pop(entry_id, None)
+        self._sensor_adders.pop(entry_id, None)
+        if self.owner_entry_id == entry_id:
+            self.owner_entry_id = None
+            # 汇总传感器已随该条目卸载，交给其余仍在加载的配置条目重新创建
+            if self._sensor_adders:
+                self._async_assign_owner(next(iter(self._sensor_adders)))
+
+    @staticmethod
+    def _get_property_id(entry_id: str, property_key: str) -> str:
+        """跨配置条目识别房产，无法识别房产的账单只在本条目内合并"""
+        return property_key or f"{entry_id}/"
+
+    def _apply(self, contribution: dict[str, Any], sign: int) -> None:
+        """把一个房产的贡献加到（sign=1）或减出（sign=-1）合计中"""
+        court = contribution["court"]
+        court_count = self._court_property_counts.get(court, 0) + sign
+        if court_count:
+            self._court_property_counts[court] = court_count
+            court_totals = self.by_court.setdefault(court, _create_empty_totals())
+        else:
+            # 小区已没有房产，直接移除其合计，避免浮点残差
+            self._court_property_counts.pop(court, None)
+            self.by_court.pop(court, None)
+            court_totals = None
+
+        for item_key, amounts in contribution["items"].items():
+            item_totals = self.by_item.setdefault(item_key, _create_empty_totals())
+            for field in PORTFOLIO_FIELDS:
+                value = sign * amounts.get(field, 0.0)
+                self.overall[field] = round(self.overall[field] + value, 2)
+                item_totals[field] = round(item_totals[field] + value, 2)
+                if court_totals is not None:
+                    court_totals[field] = round(court_totals[field] + value, 2)
+
+    @callback
+    def _async_notify(self) -> None:
+        """通知监听者合计已变化"""
+        self.version += 1
+        for update_callback in list(self._listeners):
+            update_callback()
@@ -2,25 +2,66 @@
 from __future__ import annotations
 
 import logging
-from datetime import datetime, timedelta
+from collections.abc import Callable
+from datetime import date, datetime, timedelta
+from functools import partial
 
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.util import dt as dt_util
 
 from .const import (
     DOMAIN,
+    DATA_PORTFOLIO,
+    CONF_LEGACY_SENSORS_PRUNED,
     CHARGE_TYPES,
     CHARGE_ITEMS,
+    METRIC_TYPES,
     PUBLIC_CHARGE_ITEMS
 )
 from .coordinator import HengdaPropertyCoordinator
+from .portfolio import HengdaPropertyPortfolio
 
 _LOGGER = logging.getLogger(__name__)
 
+# 金额单位（货币类传感器需使用ISO 4217货币代码，才能生成长期统计）
+CURRENCY_CNY = "CNY"
+
+# 跨房产和配置条目的汇总传感器
+PORTFOLIO_SENSORS = {
+    "prepaid": "全部预交余额",
+    "paid": "全部月已交费用",
+    "pending": "全部待交费用"
+}
+
+
+def _build_device_info(
+    coordinator: HengdaPropertyCoordinator, charge_type: str, charge_type_name: str
+) -> DeviceInfo:
+    """构建费用类型设备信息，房产名称等静态信息放在设备上而不是状态属性中"""
+    houses = []
+    if coordinator.data is not None:
+        for property_items in coordinator.data.get("prepaid_by_property", {}).values():
+            for item_data in property_items.values():
+                house = item_data.get("house")
+                if house and house != "未知" and house not in houses:
+                    houses.append(house)
+    
+    return DeviceInfo(
+        identifiers={(DOMAIN, f"{DOMAIN}_{charge_type}")},
+        name=charge_type_name,
+        manufacturer="恒大物业",
+        model="、".join(houses) if houses else charge_type_name,
+    )
+
 async def async_setup_entry(
     hass: HomeAssistant,
     entry: ConfigEntry,
@@ -32,14 +73,8 @@ async def async_setup_entry(
     
     sensors = []
     
-    # 为每种费用类型和设备创建传感器
+    # 为每种费用类型创建更新时间和合计传感器
     for charge_type_key, charge_type_name in CHARGE_TYPES.items():
-        # 添加常规费用传感器
-        for item_key, item_name in CHARGE_ITEMS.items():
-            sensors.append(
-                HengdaPropertySensor(coordinator, charge_type_key, charge_type_name, item_key, item_name)
-            )
-        
         # 添加更新时间传感器
         sensors.append(
             HengdaPropertyUpdateTimeSensor(coordinator, charge_type_key, charge_type_name)
@@ -60,11 +95,165 @@ async def async_setup_entry(
             )
     
     async_add_entities(sensors, True)
+    
+    # 跨配置条目的汇总传感器由其中一个已加载的配置条目创建，
+    # 该条目卸载后由其余仍在加载的配置条目重新创建
+    portfolio: HengdaPropertyPortfolio = hass.data[DATA_PORTFOLIO]
+    
+    @callback
+    def _async_add_portfolio_sensors() -> None:
+        """创建汇总传感器"""
+        async_add_entities(
+            [
+                HengdaPropertyPortfolioSensor(portfolio, field, name)
+                for field, name in PORTFOLIO_SENSORS.items()
+            ],
+            True,
+        )
+    
+    portfolio.async_register_entry(entry.entry_id, _async_add_portfolio_sensors)
+    
+    # 费用传感器和指标传感器根据返回数据中实际出现的费用项目动态创建
+    static_unique_ids = {sensor.unique_id for sensor in sensors}
+    dynamic_sensors: dict[str, SensorEntity] = {}
+    
+    @callback
+    def _async_sync_dynamic_sensors() -> None:
+        """根据当前数据同步动态传感器"""
+        if coordinator.data is None:
+            return
+        
+        registry = er.async_get(hass)
+        wanted = _get_wanted_dynamic_sensors(coordinator)
+        
+        if entry.data.get(CONF_LEGACY_SENSORS_PRUNED):
+            # 已见过的费用项目（实体注册表中已有）本次没有数据时保留并显示为0，
+            # 例如账单缴清后的待交费用，不删除实体，保留用户设置的名称、区域等
+            for registry_entry in er.async_entries_for_config_entry(registry, entry.entry_id):
+                unique_id = registry_entry.unique_id
+                if unique_id not in wanted and unique_id not in static_unique_ids:
+                    factory = _get_charge_sensor_factory(coordinator, unique_id)
+                    if factory is not None:
+                        wanted[unique_id] = factory
+        elif coordinator.fresh_sources >= CHARGE_TYPES.keys():
+            # 升级后第一次所有类型都获取成功时，清理旧版本固定创建、但本房产并不存在的费用传感器；
+            # 有类型获取失败时数据不完整，不做清理
+            stale_unique_ids = {
+                f"{DOMAIN}_{charge_type_key}_{item_key}"
+                for charge_type_key in CHARGE_TYPES
+                for item_key in CHARGE_ITEMS
+            } - wanted.keys()
+            for registry_entry in er.async_entries_for_config_entry(registry, entry.entry_id):
+                if registry_entry.unique_id in stale_unique_ids:
+                    registry.async_remove(registry_entry.entity_id)
+            hass.config_entries.async_update_entry(
+                entry, data={**entry.data, CONF_LEGACY_SENSORS_PRUNED: True}
+            )
+        
+        new_sensors = []
+        for unique_id in sorted(wanted.keys() - dynamic_sensors.keys()):
+            sensor = wanted[unique_id]()
+            dynamic_sensors[unique_id] = sensor
+            new_sensors.append(sensor)
+        if new_sensors:
+            async_add_entities(new_sensors, True)
+    
+    _async_sync_dynamic_sensors()
+    entry.async_on_unload(coordinator.async_add_listener(_async_sync_dynamic_sensors))
+
+
+def _get_charge_sensor_factory(
+    coordinator: HengdaPropertyCoordinator, unique_id: str
+) -> Callable[[], SensorEntity] | None:
+    """根据费用传感器的唯一ID返回创建函数，不是费用传感器时返回None"""
+    for charge_type_key, charge_type_name in CHARGE_TYPES.items():
+        prefix = f"{DOMAIN}_{charge_type_key}_"
+        if unique_id.startswith(prefix):
+            item_key = unique_id[len(prefix):]
+            return partial(
+                HengdaPropertySensor,
+                coordinator,
+                charge_type_key,
+                charge_type_name,
+                item_key,
+                CHARGE_ITEMS.get(item_key, item_key),
+            )
+    return None
+
+
+def _get_wanted_dynamic_sensors(
+    coordinator: HengdaPropertyCoordinator,
+) -> dict[str, Callable[[], SensorEntity]]:
+    """根据当前数据计算应存在的动态传感器，返回唯一ID到创建函数的映射"""
+    wanted = {}
+    
+    # 每种费用类型只为该类型数据中实际出现的费用项目创建传感器
+    for charge_type_key in CHARGE_TYPES:
+        for item_key in coordinator.data.get(charge_type_key, {}):
+            unique_id = f"{DOMAIN}_{charge_type_key}_{item_key}"
+            wanted[unique_id] = _get_charge_sensor_factory(coordinator, unique_id)
+    
+    # 只为能计算出结果的指标创建传感器
+    metrics_data = coordinator.data.get("metrics", {})
+    for item_key, item_metrics in metrics_data.get("items", {}).items():
+        for metric_key in METRIC_TYPES:
+            if metric_key in item_metrics:
+                wanted[f"{DOMAIN}_metric_{item_key}_{metric_key}"] = partial(
+                    HengdaPropertyMetricSensor,
+                    coordinator,
+                    item_key,
+                    CHARGE_ITEMS.get(item_key, item_key),
+                    metric_key,
+                )
+    property_metrics = metrics_data.get("property", {})
+    if "amount_change" in property_metrics:
+        wanted[f"{DOMAIN}_metric_property_amount_change"] = partial(
+            HengdaPropertyMetricSensor, coordinator, None, "月费用", "amount_change"
+        )
+    for metric_key in ("water_consumption", "electricity_consumption"):
+        if metric_key in property_metrics:
+            wanted[f"{DOMAIN}_metric_property_{metric_key}"] = partial(
+                HengdaPropertyMetricSensor, coordinator, None, "房产", metric_key
+            )
+    
+    # 只为有预交余额且能计算出消耗速度的费用项目创建可用天数传感器
+    forecast_data = coordinator.data.get("forecast", {})
+    for item_key, item_forecast in forecast_data.get("items", {}).items():
+        if "days_until_depletion" in item_forecast:
+            wanted[f"{DOMAIN}_forecast_{item_key}"] = partial(
+                HengdaPropertyForecastSensor,
+                coordinator,
+                item_key,
+                CHARGE_ITEMS.get(item_key, item_key),
+            )
+    if forecast_data.get("total"):
+        wanted[f"{DOMAIN}_forecast_total"] = partial(
+            HengdaPropertyForecastSensor, coordinator, None, "预交费用"
+        )
+    
+    return wanted
 
 
 class HengdaPropertySensor(SensorEntity):
     """Representation of a Hengda Property Sensor."""
 
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
+    # 静态或很少变化的属性不写入数据库
+    _unrecorded_attributes = frozenset({
+        "费用类型",
+        "年份",
+        "月份",
+        "账单日期",
+        "应缴日期",
+        "客户姓名",
+        "费用项目",
+        "子费用项",
+        "按房产",
+        "上次读数",
+        "当前读数",
+    })
+
     def __init__(
         self, 
         coordinator: HengdaPropertyCoordinator, 
@@ -85,12 +274,7 @@ class HengdaPropertySensor(SensorEntity):
         self._attr_unique_id = f"{DOMAIN}_{charge_type}_{item_key}"
         
         # 设置设备信息
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, f"{DOMAIN}_{charge_type}")},
-            name=charge_type_name,
-            manufacturer="恒大物业",
-            model=charge_type_name,
-        )
+        self._attr_device_info = _build_device_info(coordinator, charge_type, charge_type_name)
 
     @property
     def available(self) -> bool:
@@ -115,10 +299,23 @@ class HengdaPropertySensor(SensorEntity):
         
         return 0
 
+    @property
+    def last_reset(self) -> datetime | None:
+        """Return the start of the bill month for paid sensors."""
+        if self._charge_type != "paid" or self.coordinator.data is None:
+            return None
+        
+        item_data = self.coordinator.data.get("paid", {}).get(self._item_key, {})
+        try:
+            bill_month = date(int(item_data.get("year", "")), int(item_data.get("month", "")), 1)
+        except ValueError:
+            return None
+        return dt_util.start_of_local_day(bill_month)
+
     @property
     def native_unit_of_measurement(self):
         """Return the unit of measurement."""
-        return "元"
+        return CURRENCY_CNY
 
     @property
     def extra_state_attributes(self):
@@ -145,10 +342,10 @@ class HengdaPropertySensor(SensorEntity):
             return {
                 "费用类型": "预交费用",
                 "客户姓名": item_data.get("customer", "未知"),
-                "房产名称": item_data.get("house", "未知"),
                 "费用项目": item_data.get("charge_item", "未知项目"),
                 "子费用项": item_data.get("sub_charge_item", ""),
-                "冻结金额": item_data.get("frozen_amount", 0)
+                "冻结金额": item_data.get("frozen_amount", 0),
+                "按房产": item_data.get("properties", {})
             }
         elif self._charge_type == "pending":
             return {
@@ -175,6 +372,15 @@ class HengdaPropertySensor(SensorEntity):
 class HengdaPropertyUpdateTimeSensor(SensorEntity):
     """Representation of a Hengda Property Update Time Sensor."""
 
+    # 更新时间属性每次都会变化且只用于展示，不写入数据库
+    _unrecorded_attributes = frozenset({
+        "费用类型",
+        "数据年份",
+        "最后尝试更新",
+        "下次计划更新",
+        "更新状态",
+    })
+
     def __init__(
         self, 
         coordinator: HengdaPropertyCoordinator, 
@@ -190,12 +396,7 @@ class HengdaPropertyUpdateTimeSensor(SensorEntity):
         self._attr_unique_id = f"{DOMAIN}_{charge_type}_update_time"
         
         # 设置设备信息
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, f"{DOMAIN}_{charge_type}")},
-            name=charge_type_name,
-            manufacturer="恒大物业",
-            model=charge_type_name,
-        )
+        self._attr_device_info = _build_device_info(coordinator, charge_type, charge_type_name)
 
     @property
     def available(self) -> bool:
@@ -270,6 +471,20 @@ class HengdaPropertyUpdateTimeSensor(SensorEntity):
 class HengdaPropertyTotalSensor(SensorEntity):
     """Representation of a Hengda Property Total Sensor."""
 
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
+    # 明细金额已由各费用传感器记录，这里不再重复写入数据库
+    _unrecorded_attributes = frozenset({
+        "费用类型",
+        "年份",
+        "月份",
+        "公摊水费",
+        "梯灯电费",
+        "公摊电费",
+        "电梯电费",
+        "水泵电费",
+    })
+
     def __init__(
         self, 
         coordinator: HengdaPropertyCoordinator, 
@@ -289,12 +504,7 @@ class HengdaPropertyTotalSensor(SensorEntity):
         self._attr_unique_id = f"{DOMAIN}_{charge_type}_{total_type}"
         
         # 设置设备信息
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, f"{DOMAIN}_{charge_type}")},
-            name=charge_type_name,
-            manufacturer="恒大物业",
-            model=charge_type_name,
-        )
+        self._attr_device_info = _build_device_info(coordinator, charge_type, charge_type_name)
 
     @property
     def available(self) -> bool:
@@ -310,10 +520,31 @@ class HengdaPropertyTotalSensor(SensorEntity):
         total_data = self.coordinator.data.get("total", {})
         return total_data.get(self._total_type, 0)
 
+    @property
+    def last_reset(self) -> datetime | None:
+        """Return the start of the latest bill month for the monthly public total."""
+        if self._total_type != "paid_public_total" or self.coordinator.data is None:
+            return None
+        
+        # 月公摊费是最近一个账单月的合计，每个账单月重新开始累计
+        paid_data = self.coordinator.data.get("paid", {})
+        bill_months = []
+        for item_key in PUBLIC_CHARGE_ITEMS:
+            item_data = paid_data.get(item_key, {})
+            try:
+                bill_months.append(
+                    date(int(item_data.get("year", "")), int(item_data.get("month", "")), 1)
+                )
+            except ValueError:
+                continue
+        if not bill_months:
+            return None
+        return dt_util.start_of_local_day(max(bill_months))
+
     @property
     def native_unit_of_measurement(self):
         """Return the unit of measurement."""
-        return "元"
+        return CURRENCY_CNY
 
     @property
     def extra_state_attributes(self):
@@ -354,4 +585,231 @@ class HengdaPropertyTotalSensor(SensorEntity):
             self.coordinator.async_add_listener(
                 self.async_write_ha_state
             )
-        )
\ No newline at end of file
+        )
+
+
+class HengdaPropertyMetricSensor(SensorEntity):
+    """Representation of a Hengda Property derived metric sensor."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _unrecorded_attributes = frozenset({"账单日期"})
+
+    def __init__(
+        self,
+        coordinator: HengdaPropertyCoordinator,
+        item_key: str | None,
+        item_name: str,
+        metric_key: str
+    ) -> None:
+        """Initialize the sensor."""
+        self.coordinator = coordinator
+        self._item_key = item_key
+        self._metric_key = metric_key
+        
+        self._attr_name = f"{item_name}{METRIC_TYPES[metric_key]}"
+        self._attr_unique_id = f"{DOMAIN}_metric_{item_key or 'property'}_{metric_key}"
+        
+        # 用量单位：水费按立方米，电费按千瓦时
+        if metric_key == "water_consumption" or item_key == "water_fee" or "水费" in item_name:
+            consumption_unit = "m³"
+        elif metric_key == "electricity_consumption" or "电" in item_name:
+            consumption_unit = "kWh"
+        else:
+            consumption_unit = None
+        
+        if metric_key in ("consumption", "water_consumption", "electricity_consumption"):
+            self._attr_native_unit_of_measurement = consumption_unit
+        elif metric_key == "unit_price":
+            self._attr_native_unit_of_measurement = (
+                f"{CURRENCY_CNY}/{consumption_unit}" if consumption_unit else CURRENCY_CNY
+            )
+        else:
+            self._attr_native_unit_of_measurement = CURRENCY_CNY
+        
+        # 设置设备信息
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, f"{DOMAIN}_metrics")},
+            name="费用分析",
+            manufacturer="恒大物业",
+            model="费用分析",
+        )
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available."""
+        return self.coordinator.last_update_success and self.coordinator.data is not None
+
+    def _get_metrics(self) -> dict:
+        """Return the metrics of this item."""
+        if self.coordinator.data is None:
+            return {}
+        
+        metrics_data = self.coordinator.data.get("metrics", {})
+        if self._item_key is None:
+            return metrics_data.get("property", {})
+        return metrics_data.get("items", {}).get(self._item_key, {})
+
+    @property
+    def native_value(self):
+        """Return the state of the sensor."""
+        return self._get_metrics().get(self._metric_key)
+
+    @property
+    def extra_state_attributes(self):
+        """Return extra state attributes."""
+        if self._metric_key in ("consumption", "unit_price"):
+            bill_date = self._get_metrics().get("bill_date")
+            return {"账单日期": bill_date} if bill_date else {}
+        if self._metric_key != "amount_change":
+            return {}
+        
+        change_pct = self._get_metrics().get("amount_change_pct")
+        if change_pct is None:
+            return {}
+        return {"环比变化率": change_pct}
+
+    async def async_added_to_hass(self) -> None:
+        """When entity is added to hass."""
+        self.async_on_remove(
+            self.coordinator.async_add_listener(
+                self.async_write_ha_state
+            )
+        )
+
+
+class HengdaPropertyForecastSensor(SensorEntity):
+    """Representation of a Hengda Property prepaid depletion forecast sensor."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = "d"
+    # 预计用完日期每天都会变化，各房产明细只用于展示，不写入数据库
+    _unrecorded_attributes = frozenset({"预计用完日期", "按房产"})
+
+    def __init__(
+        self,
+        coordinator: HengdaPropertyCoordinator,
+        item_key: str | None,
+        item_name: str
+    ) -> None:
+        """Initialize the sensor."""
+        self.coordinator = coordinator
+        self._item_key = item_key
+        
+        self._attr_name = f"{item_name}可用天数"
+        self._attr_unique_id = f"{DOMAIN}_forecast_{item_key or 'total'}"
+        
+        # 设置设备信息
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, f"{DOMAIN}_metrics")},
+            name="费用分析",
+            manufacturer="恒大物业",
+            model="费用分析",
+        )
+
+    @property
+    def available(self) -> bool:
+        """Return if entity is available."""
+        return self.coordinator.last_update_success and self.coordinator.data is not None
+
+    def _get_forecast(self) -> dict:
+        """Return the forecast of this item."""
+        if self.coordinator.data is None:
+            return {}
+        
+        forecast_data = self.coordinator.data.get("forecast", {})
+        if self._item_key is None:
+            return forecast_data.get("total", {})
+        return forecast_data.get("items", {}).get(self._item_key, {})
+
+    @property
+    def native_value(self):
+        """Return the state of the sensor."""
+        return self._get_forecast().get("days_until_depletion")
+
+    @property
+    def extra_state_attributes(self):
+        """Return extra state attributes."""
+        forecast = self._get_forecast()
+        attributes = {
+            "日均消耗": forecast.get("daily_rate", 0),
+            "预计用完日期": forecast.get("depletion_date", ""),
+        }
+        if "monthly_rate" in forecast:
+            attributes["月均消耗"] = forecast["monthly_rate"]
+        if forecast.get("properties"):
+            attributes["按房产"] = forecast["properties"]
+        return attributes
+
+    async def async_added_to_hass(self) -> None:
+        """When entity is added to hass."""
+        self.async_on_remove(
+            self.coordinator.async_add_listener(
+                self.async_write_ha_state
+            )
+        )
+
+
+class HengdaPropertyPortfolioSensor(SensorEntity):
+    """Representation of a Hengda Property portfolio total sensor."""
+
+    _attr_device_class = SensorDeviceClass.MONETARY
+    _attr_state_class = SensorStateClass.TOTAL
+    _attr_native_unit_of_measurement = CURRENCY_CNY
+    _attr_should_poll = False
+    # 按小区和费用项目的明细只用于展示，不写入数据库
+    _unrecorded_attributes = frozenset({"房产数量", "按小区", "按费用项目"})
+
+    def __init__(
+        self,
+        portfolio: HengdaPropertyPortfolio,
+        field: str,
+        name: str
+    ) -> None:
+        """Initialize the sensor."""
+        self._portfolio = portfolio
+        self._field = field
+        
+        self._attr_name = name
+        self._attr_unique_id = f"{DOMAIN}_portfolio_{field}"
+        
+        # 已交费用是各房产最近一个账单月的合计，各房产账单月不一致，没有统一的重置时间，
+        # 按普通测量值记录
+        if field == "paid":
+            self._attr_device_class = None
+            self._attr_state_class = SensorStateClass.MEASUREMENT
+        
+        # 设置设备信息
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, f"{DOMAIN}_portfolio")},
+            name="物业费汇总",
+            manufacturer="恒大物业",
+            model="物业费汇总",
+        )
+
+    @property
+    def native_value(self):
+        """Return the state of the sensor."""
+        return self._portfolio.overall[self._field]
+
+    @property
+    def extra_state_attributes(self):
+        """Return extra state attributes."""
+        return {
+            "房产数量": self._portfolio.property_count,
+            "按小区": {
+                court or "未知小区": totals[self._field]
+                for court, totals in self._portfolio.by_court.items()
+            },
+            "按费用项目": {
+                CHARGE_ITEMS.get(item_key, item_key): totals[self._field]
+                for item_key, totals in self._portfolio.by_item.items()
+            },
+        }
+
+    async def async_added_to_hass(self) -> None:
+        """When entity is added to hass."""
+        self.async_on_remove(
+            self._portfolio.async_add_listener(
+                self.async_write_ha_state
+            )
+        )
@@ -0,0 +1,244 @@
+"""HTTP transport for Hengda Property integration."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import hashlib
+import json
+import logging
+import time
+from typing import Any
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .cache import HengdaPropertyCache
+from .const import AUTH_ERROR_CODES, AUTH_ERROR_KEYWORDS, LARGE_PAYLOAD_THRESHOLD
+
+_LOGGER = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+try:
+    import brotli  # noqa: F401
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+else:
+    ACCEPT_ENCODING = "gzip, deflate, br"
+
+
+def _decode_json(raw: bytes) -> Any:
+    """解析JSON响应"""
+    return json.loads(raw) if raw else None
+
+
+class HengdaPropertyAuthError(Exception):
+    """认证信息失效"""
+
+
+def is_auth_error(data: Any) -> bool:
+    """判断响应内容是否表示认证信息失效"""
+    if not isinstance(data, dict):
+        return False
+    if data.get("code") in AUTH_ERROR_CODES:
+        return True
+    # 只在接口明确返回失败时才按错误信息判断，避免误判正常数据
+    if data.get("success") is not False:
+        return False
+    message = str(data.get("msg") or data.get("message") or "").lower()
+    return any(keyword in message for keyword in AUTH_ERROR_KEYWORDS)
+
+
+class HengdaPropertyTransport:
+    """发送API请求，统计流量，并在省流量模式下使用压缩和条件请求"""
+
+    def __init__(
+        self, hass: HomeAssistant, save_bandwidth: bool, cache: HengdaPropertyCache
+    ) -> None:
+        """Initialize."""
+        self._hass = hass
+        # 使用Home Assistant共享的会话，复用连接，避免每次请求都重新进行TLS握手
+        self._session = async_get_clientsession(hass)
+        self.save_bandwidth = save_bandwidth
+
+        # 认证失败后不再发送请求，等待重新认证
+        self.auth_failed = False
+
+        # 条件请求的验证信息保存在共享内存预算的缓存中：{"etag", "last_modified", "data"}
+        self._cache = cache
+
+        # 流量统计：按接口累计，以及最近一次更新的合计
+        self.endpoint_stats: dict[str, dict[str, int]] = {}
+        self.refresh_stats = self._create_empty_stats()
+
+        # 响应处理统计：在事件循环中处理的次数及阻塞时间，放到线程池中处理的次数
+        self.processing_stats = {
+            "inline": 0,
+            "offloaded": 0,
+            "last_stall_ms": 0.0,
+            "max_stall_ms": 0.0,
+            "total_stall_ms": 0.0,
+        }
+
+    @staticmethod
+    def _create_empty_stats() -> dict[str, int]:
+        """创建空的流量统计"""
+        return {
+            "requests": 0,
+            "not_modified": 0,
+            "bytes_sent": 0,
+            "bytes_received": 0,
+        }
+
+    def start_refresh(self) -> None:
+        """开始新一次更新，重置本次更新的流量统计"""
+        self.refresh_stats = self._create_empty_stats()
+
+    async def post(
+        self,
+        endpoint: str,
+        url: str,
+        payload: dict[str, Any],
+        headers: dict[str, str],
+        processor: Callable[[Any], Any] | None = None,
+        data_key: str | None = None,
+    ) -> tuple[int, Any]:
+        """发送POST请求，返回(状态码, 解析后的JSON数据或processor处理后的结果)
+        
+        processor以(解析后的数据, 响应字节数)调用。响应较大时，JSON解析和processor
+        都在线程池中执行，结果直接返回，不做额外复制。
+        指定data_key时，解析后的数据以可溢出的方式保存在缓存的data_key条目中，
+        按响应字节数计入内存预算；条件请求的缓存条目只保存验证信息，不重复保存数据。
+        认证失效时抛出HengdaPropertyAuthError，之后的请求不再发送。
+        """
+        if self.auth_failed:
+            raise HengdaPropertyAuthError(f"{endpoint} 已因认证失效停止请求")
+
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+        request_headers = {**headers, "Content-Type": "application/json"}
+
+        cache_key = None
+        cached = None
+        stored = None
+        if self.save_bandwidth:
+            request_headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+            # 同一请求再次发送时带上服务器返回过的验证信息
+            cache_key = "response_" + hashlib.sha1(url.encode() + b"\n" + body).hexdigest()
+            cached = self._cache.get(cache_key)
+            if cached is not None and data_key is not None:
+                stored = await self._cache.async_get(data_key)
+                if stored is None:
+                    # 数据已不在缓存中，无法复用，发送普通请求
+                    cached = None
+            if cached is not None:
+                if cached["etag"]:
+                    request_headers["If-None-Match"] = cached["etag"]
+                if cached["last_modified"]:
+                    request_headers["If-Modified-Since"] = cached["last_modified"]
+        else:
+            # aiohttp默认会请求gzip压缩，关闭省流量模式时明确要求不压缩
+            request_headers["Accept-Encoding"] = "identity"
+
+        async with self._session.post(
+            url, data=body, headers=request_headers, timeout=REQUEST_TIMEOUT
+        ) as response:
+            raw = await response.read()
+
+            # 压缩传输时Content-Length是压缩后的大小，缺失时只能按解压后的大小统计
+            bytes_received = int(response.headers.get(aiohttp.hdrs.CONTENT_LENGTH, len(raw)))
+            bytes_sent = len(body) + sum(
+                len(key) + len(value) for key, value in request_headers.items()
+            )
+            not_modified = response.status == 304 and cached is not None
+            self._record(endpoint, bytes_sent, bytes_received, not_modified)
+
+            if not_modified:
+                _LOGGER.debug("%s 数据未变化，使用缓存数据", endpoint)
+                data = stored if data_key is not None else cached["data"]
+                return 200, await self._async_process(cached["size"], processor, data)
+            if response.status in (401, 403):
+                self._raise_auth_error(endpoint, response.status)
+            if response.status != 200:
+                return response.status, None
+
+            data = await self.async_run(len(raw), _decode_json, raw)
+            if is_auth_error(data):
+                self._raise_auth_error(endpoint, response.status)
+
+            # 按响应字节数计入内存预算，不在事件循环中重新序列化估算大小
+            if data_key is not None:
+                self._cache.put(data_key, data, spill=True, size=len(raw))
+            if cache_key is not None:
+                etag = response.headers.get(aiohttp.hdrs.ETAG)
+                last_modified = response.headers.get(aiohttp.hdrs.LAST_MODIFIED)
+                if etag or last_modified:
+                    validators = {"etag": etag, "last_modified": last_modified, "size": len(raw)}
+                    if data_key is None:
+                        validators["data"] = data
+                    self._cache.put(
+                        cache_key, validators, size=len(raw) if data_key is None else None
+                    )
+                else:
+                    self._cache.pop(cache_key)
+
+            return response.status, await self._async_process(len(raw), processor, data)
+
+    async def _async_process(
+        self, size: int, processor: Callable[[Any], Any] | None, data: Any
+    ) -> Any:
+        """用processor处理解析后的数据"""
+        if processor is None:
+            return data
+        return await self.async_run(size, processor, data, size)
+
+    async def async_run(self, size: int, func: Callable[..., Any], *args: Any) -> Any:
+        """数据较大时在线程池中执行，否则直接在事件循环中执行并记录阻塞时间"""
+        if size >= LARGE_PAYLOAD_THRESHOLD:
+            self.processing_stats["offloaded"] += 1
+            return await self._hass.async_add_executor_job(func, *args)
+
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            stall_ms = (time.perf_counter() - start) * 1000
+            self.processing_stats["inline"] += 1
+            self.processing_stats["last_stall_ms"] = round(stall_ms, 3)
+            self.processing_stats["max_stall_ms"] = round(
+                max(self.processing_stats["max_stall_ms"], stall_ms), 3
+            )
+            self.processing_stats["total_stall_ms"] = round(
+                self.processing_stats["total_stall_ms"] + stall_ms, 3
+            )
+
+    def _raise_auth_error(self, endpoint: str, status: int) -> None:
+        """标记认证失效并抛出异常"""
+        self.auth_failed = True
+        raise HengdaPropertyAuthError(f"{endpoint} 认证失效: {status}")
+
+    def _record(
+        self, endpoint: str, bytes_sent: int, bytes_received: int, not_modified: bool
+    ) -> None:
+        """记录一次请求的流量"""
+        endpoint_stats = self.endpoint_stats.setdefault(endpoint, self._create_empty_stats())
+        for stats in (endpoint_stats, self.refresh_stats):
+            stats["requests"] += 1
+            stats["not_modified"] += int(not_modified)
+            stats["bytes_sent"] += bytes_sent
+            stats["bytes_received"] += bytes_received
+
+    def as_dict(self) -> dict[str, Any]:
+        """返回流量统计，用于诊断信息"""
+        return {
+            "save_bandwidth": self.save_bandwidth,
+            "last_refresh": dict(self.refresh_stats),
+            "processing": {
+                "offload_threshold_bytes": LARGE_PAYLOAD_THRESHOLD,
+                **self.processing_stats,
+            },
+            "endpoints": {
+                endpoint: dict(stats) for endpoint, stats in self.endpoint_stats.items()
+            },
+        }
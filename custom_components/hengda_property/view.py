@@ -0,0 +1,93 @@
+"""Local JSON view of processed Hengda Property data."""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any
+
+from aiohttp import hdrs, web
+
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import HengdaPropertyCoordinator
+
+# 序列化后的快照在配置条目缓存中的键
+VIEW_BODY_CACHE_KEY = "view_body"
+
+
+class HengdaPropertyDataView(HomeAssistantView):
+    """返回协调器处理后的数据快照，数据未变化时返回304"""
+
+    url = f"/api/{DOMAIN}/data"
+    extra_urls = [f"/api/{DOMAIN}/data/{{entry_id}}"]
+    name = f"api:{DOMAIN}:data"
+    requires_auth = True
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize."""
+        self.hass = hass
+
+    async def get(self, request: web.Request, entry_id: str | None = None) -> web.Response:
+        """Return the processed snapshot of one or all config entries."""
+        coordinators: dict[str, HengdaPropertyCoordinator] = self.hass.data.get(DOMAIN, {})
+        if entry_id is not None:
+            if entry_id not in coordinators:
+                return self.json_message(f"未找到配置条目: {entry_id}", 404)
+            coordinators = {entry_id: coordinators[entry_id]}
+
+        # ETag由各配置条目的实例标识和快照版本组成
+        versions = ",".join(
+            f"{key}:{coordinator.data_nonce}:{coordinator.data_version}"
+            for key, coordinator in sorted(coordinators.items())
+        )
+        etag = '"' + hashlib.sha1(versions.encode()).hexdigest()[:16] + '"'
+        headers = {hdrs.ETAG: etag, hdrs.CACHE_CONTROL: "no-cache"}
+
+        if request.headers.get(hdrs.IF_NONE_MATCH) == etag:
+            return web.Response(status=304, headers=headers)
+
+        if entry_id is not None:
+            body = self._get_body(coordinators[entry_id])
+        else:
+            body = (
+                b'{"entries":['
+                + b",".join(self._get_body(coordinator) for coordinator in coordinators.values())
+                + b"]}"
+            )
+
+        return web.Response(
+            body=body,
+            content_type="application/json",
+            charset="utf-8",
+            headers=headers,
+        )
+
+    @classmethod
+    def _get_body(cls, coordinator: HengdaPropertyCoordinator) -> bytes:
+        """获取一个配置条目序列化后的快照，数据变化前复用
+        
+        序列化结果保存在该配置条目的缓存中，按字节数计入其内存预算，超出预算时可被淘汰。
+        """
+        # 同时按版本号和数据对象判断是否过期，数据替换前后的请求不会复用错误的快照
+        stamp = (coordinator.data_version, id(coordinator.data))
+        cached = coordinator.cache.get(VIEW_BODY_CACHE_KEY)
+        if cached is None or cached[0] != stamp:
+            body = json.dumps(
+                cls._get_snapshot(coordinator), ensure_ascii=False, default=str
+            ).encode()
+            cached = (stamp, body)
+            coordinator.cache.put(VIEW_BODY_CACHE_KEY, cached, size=len(body))
+        return cached[1]
+
+    @staticmethod
+    def _get_snapshot(coordinator: HengdaPropertyCoordinator) -> dict[str, Any]:
+        """获取一个配置条目的数据快照"""
+        return {
+            "entry_id": coordinator.entry.entry_id,
+            "title": coordinator.entry.title,
+            "year": coordinator.year,
+            "version": coordinator.data_version,
+            "data": coordinator.data,
+        }